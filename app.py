@@ -8,14 +8,29 @@ import threading
 import os
 import time
 from datetime import datetime
-from telegram_downloader import main as telegram_main, current_progress
-from drive_uploader import DriveUploader
+from telegram_downloader import main as telegram_main, current_progress, monitor as telegram_monitor, stop_monitor, monitor_state
+from drive_uploader import drive_sessions
+from logging_config import setup_logging
+from profiler import profiler, PROFILE_TOKEN, PROFILE_MAX_SECONDS
+from session_pool import session_pool
+from metadata_cache import metadata_cache
+import crypto_backend
+from concurrency import download_limiter, upload_limiter
+from bandwidth import shapers
 import json
+import hashlib
+import hmac
+import logging
+import importlib.util
 import traceback
 
 
 app = Flask(__name__)
 
+setup_logging()
+logger = logging.getLogger('teletodrive.app')
+request_logger = logging.getLogger('teletodrive.requests')
+
 
 # ============================================================================
 # COMPREHENSIVE CORS CONFIGURATION
@@ -51,9 +66,8 @@ CORS(app,
 def handle_preflight():
     """Handle preflight OPTIONS requests globally"""
     if request.method == "OPTIONS":
-        print(f"🔄 Global OPTIONS handler for: {request.path}")
-        print(f"🌐 Origin: {request.headers.get('Origin', 'No origin')}")
-        print(f"📋 Headers: {dict(request.headers)}")
+        request_logger.debug("🔄 Preflight", extra={'method': 'OPTIONS', 'path': request.path,
+                                                     'origin': request.headers.get('Origin')})
         
         response = make_response()
         
@@ -71,17 +85,14 @@ def handle_preflight():
         
         if origin in allowed_origins:
             response.headers['Access-Control-Allow-Origin'] = origin
-            print(f"✅ Allowed origin: {origin}")
         else:
             response.headers['Access-Control-Allow-Origin'] = '*'
-            print(f"⚠️ Using wildcard for origin: {origin}")
             
         response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS, HEAD, PATCH'
         response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, Accept, Origin, X-Requested-With, Cache-Control'
         response.headers['Access-Control-Max-Age'] = '3600'
         response.headers['Access-Control-Allow-Credentials'] = 'false'
         
-        print("✅ Preflight response headers set")
         return response
 
 
@@ -141,25 +152,21 @@ def create_error_response(error_type, message, details, status_code=500, suggest
         'timestamp': datetime.now().isoformat()
     }
     
-    # Log detailed error information
-    print(f"❌ API Error ({error_type.upper()}): {message}")
-    print(f"🔍 Details: {details}")
-    if suggestions:
-        print("💡 Suggestions:")
-        for i, suggestion in enumerate(suggestions, 1):
-            print(f"   {i}. {suggestion}")
+    # Log error information (queued; never blocks the request thread)
+    request_logger.warning(f"❌ API Error ({error_type.upper()}): {message}",
+                           extra={'error_type': error_type, 'details': details, 'status': status_code})
     
     return jsonify(error_response), status_code
 
 
 def log_request_info():
-    """Log detailed request information for debugging"""
-    print(f"🌐 Request: {request.method} {request.path}")
-    print(f"📡 Origin: {request.headers.get('Origin', 'No origin')}")
-    print(f"🔍 User-Agent: {request.headers.get('User-Agent', 'No user agent')}")
-    print(f"📋 Content-Type: {request.headers.get('Content-Type', 'No content type')}")
-    if request.args:
-        print(f"🔗 Query params: {dict(request.args)}")
+    """Log a sampled structured request record (no header dump)"""
+    request_logger.info("🌐 Request", extra={
+        'method': request.method,
+        'path': request.path,
+        'origin': request.headers.get('Origin'),
+        'query': request.query_string.decode() or None
+    })
 
 
 # Enhanced global variables to track process status with chunked streaming support
@@ -197,39 +204,46 @@ def check_credentials():
         missing_files = [f for f in required_files if not os.path.exists(f)]
         
         if missing_files:
-            print(f"⚠️ Missing credential files: {missing_files}")
+            logger.warning(f"⚠️ Missing credential files: {missing_files}")
             return False, missing_files
         
         # Additional validation - check if credentials.json is valid JSON
         try:
             with open('credentials.json', 'r') as f:
                 json.load(f)
-            print("✅ Credentials file validated")
+            logger.debug("✅ Credentials file validated")
         except json.JSONDecodeError as e:
-            print(f"❌ Invalid JSON in credentials.json: {e}")
+            logger.error(f"❌ Invalid JSON in credentials.json: {e}")
             return False, ['credentials.json (invalid JSON)']
             
         return True, []
     except Exception as e:
-        print(f"❌ Error checking credentials: {e}")
+        logger.error(f"❌ Error checking credentials: {e}")
         return False, [f'Error checking files: {str(e)}']
 
 
-def get_stats():
-    """Get upload statistics with enhanced error handling"""
+def missing_dependencies():
+    """List transfer dependencies that are not installed, without importing them"""
+    return [name for name in ('telethon', 'googleapiclient', 'google_auth_oauthlib')
+            if importlib.util.find_spec(name) is None]
+
+
+def get_stats(include_files=False):
+    """Get upload statistics with enhanced error handling (files_detail only on request)"""
     try:
-        print("📊 Getting upload statistics...")
-        uploader = DriveUploader()
-        stats_data = uploader.get_upload_stats()
+        uploader = drive_sessions.uploader()
+        stats_data = uploader.get_upload_stats(include_files=include_files)
         
         stats = {
             'total_uploaded': stats_data.get('total_files', 0),
             'total_size_mb': stats_data.get('total_size_mb', 0),
-            'recently_uploaded': list(stats_data.get('files', {}).keys())[-5:] if stats_data.get('files') else [],
-            'total_files_tracked': len(stats_data.get('files', {})),
-            'files_detail': stats_data.get('files', {})
+            'recently_uploaded': stats_data.get('recently_uploaded', []),
+            'total_files_tracked': stats_data.get('total_files', 0),
+            'last_modified': datetime.fromtimestamp(stats_data['last_modified']).isoformat() if stats_data.get('last_modified') else None
         }
-        print(f"✅ Stats retrieved: {stats['total_uploaded']} files uploaded ({stats['total_size_mb']:.1f} MB)")
+        if include_files:
+            stats['files_detail'] = stats_data.get('files', {})
+        logger.debug(f"📊 Stats: {stats['total_uploaded']} files uploaded ({stats['total_size_mb']:.1f} MB)")
         return stats
         
     except ImportError as e:
@@ -257,6 +271,31 @@ def get_stats():
         }
 
 
+def etag_response(payload):
+    """jsonify payload with a content-based ETag, answering 304 when the client already has it"""
+    etag = hashlib.md5(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(jsonify({**payload, 'timestamp': datetime.now().isoformat()}))
+    response.set_etag(etag)
+    return response
+
+
+def parse_time_arg(value):
+    """Parse an epoch-seconds or ISO date/datetime query parameter"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def parse_int_arg(value):
+    return int(value) if value not in (None, '') else None
+
+
 def sync_progress_from_telegram():
     """Sync progress from telegram_downloader module with enhanced error handling for chunked operations"""
     global process_status
@@ -299,6 +338,7 @@ def sync_progress_from_telegram():
         
         # New fields for chunked operations
         process_status['memory_usage'] = current_progress.get('memory_usage', 0)
+        process_status['memory'] = current_progress.get('memory')
         process_status['chunk_queue_size'] = current_progress.get('chunk_queue_size', 0)
         
     except ImportError as e:
@@ -308,6 +348,40 @@ def sync_progress_from_telegram():
         print(f"📋 Traceback: {traceback.format_exc()}")
 
 
+def build_progress_data():
+    """Detailed progress payload shared by the Flask and ASGI servers"""
+    return {
+        'running': process_status['running'],
+        'streaming_active': process_status.get('streaming_active', False),
+        'simultaneous_operations': process_status.get('simultaneous_operations', False),
+        'current_operation': process_status.get('current_operation'),
+        'current_file': process_status.get('current_file'),
+        'download_progress': process_status.get('download_progress', 0),
+        'upload_progress': process_status.get('upload_progress', 0),
+        'total_files': process_status.get('total_files', 0),
+        'processed_files': process_status.get('processed_files', 0),
+        'downloaded_files': process_status.get('downloaded_files', 0),
+        'uploaded_files': process_status.get('uploaded_files', 0),
+        'current_file_size': process_status.get('current_file_size', 0),
+        'downloaded_size': process_status.get('downloaded_size', 0),
+        'uploaded_size': process_status.get('uploaded_size', 0),
+        'download_speed': process_status.get('download_speed', 0),
+        'upload_speed': process_status.get('upload_speed', 0),
+        'memory_usage': process_status.get('memory_usage', 0),
+        'memory': process_status.get('memory'),
+        'chunk_queue_size': process_status.get('chunk_queue_size', 0),
+        'eta': process_status.get('eta'),
+        'start_time': process_status.get('start_time'),
+        'last_error': process_status.get('last_error'),
+        'last_update': datetime.now().isoformat(),
+        'efficiency_metrics': {
+            'disk_usage': 'minimal (streaming)',
+            'memory_optimization': 'active',
+            'concurrent_operations': process_status.get('simultaneous_operations', False)
+        }
+    }
+
+
 async def run_telegram_process():
     """Run the telegram download and upload process with enhanced error handling for chunked operations"""
     global process_status
@@ -403,6 +477,21 @@ def run_async_function():
         print("🧵 Thread cleanup completed")
 
 
+def run_monitor_thread():
+    """Run the live monitor on its own event loop until it is stopped"""
+    print("🧵 Starting live monitoring thread...")
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(telegram_monitor())
+    except Exception as e:
+        print(f"❌ Monitoring thread error: {e}")
+        print(f"📋 Traceback: {traceback.format_exc()}")
+    finally:
+        loop.close()
+        print("🧵 Monitoring thread cleanup completed")
+
+
 # ============================================================================
 # ROUTES WITH ENHANCED ERROR HANDLING AND CORS
 # ============================================================================
@@ -434,9 +523,14 @@ def home():
                     '/': 'GET - API information',
                     '/status': 'GET - Check process status and stats',
                     '/start-upload': 'POST - Start chunked video download and upload process',
-                    '/stats': 'GET - Get upload statistics',
+                    '/stats': 'GET - Get upload statistics (?include_files=1 for the full file map)',
+                    '/uploads': 'GET - Paginated upload listing (cursor, limit, since, until, min_size, max_size, channel)',
                     '/health': 'GET - Health check',
-                    '/progress': 'GET - Get detailed progress information'
+                    '/progress': 'GET - Get detailed progress information',
+                    '/api/start-monitoring': 'POST - Start live monitoring of new videos',
+                    '/api/stop-monitoring': 'POST - Stop live monitoring',
+                    '/api/bandwidth': 'GET/POST - Bandwidth limits and time-of-day schedules per direction',
+                    '/debug/profile': 'GET - Collapsed-stack sampling profile (?seconds=N)'
                 },
                 'server_time': datetime.now().isoformat(),
                 'process_running': process_status['running'],
@@ -482,18 +576,20 @@ def health_check():
         }
         
         # Add additional health checks
-        try:
-            # Check if we can import required modules
-            import telegram_downloader
-            health_status['telegram_module'] = 'available'
-        except ImportError:
-            health_status['telegram_module'] = 'missing'
-            
-        try:
-            import drive_uploader
-            health_status['drive_module'] = 'available'
-        except ImportError:
-            health_status['drive_module'] = 'missing'
+        # Check the heavy dependencies are installed without importing them
+        missing_modules = missing_dependencies()
+        health_status['telegram_module'] = 'missing' if 'telethon' in missing_modules else 'available'
+        health_status['drive_module'] = 'missing' if 'googleapiclient' in missing_modules else 'available'
+        
+        # Telethon decrypts every downloaded byte; the pure Python path caps speed at a few MB/s.
+        # Only the result start_services cached is reported (None until then): benchmarking
+        # here would import Telethon and swap its AES backend under a running transfer
+        crypto = crypto_backend.crypto_status
+        health_status['crypto_backend'] = crypto
+        if crypto and crypto['slow_path']:
+            health_status['server_status'] = 'warning'
+            health_status['crypto_warning'] = (f"Telegram downloads decrypt in pure Python "
+                                               f"({crypto['decrypt_mb_s']} MB/s); install cryptg")
         
         return jsonify({
             'status': 'success',
@@ -535,6 +631,12 @@ def get_status():
             'memory_usage': process_status.get('memory_usage', 0),
             'chunk_queue_size': process_status.get('chunk_queue_size', 0),
             'stats': process_status.get('stats', get_stats()),
+            'monitoring': dict(monitor_state),
+            'telegram_sessions': session_pool.get_stats(),
+            'telegram_cache': metadata_cache.get_stats(),
+            'concurrency': {'download': download_limiter.get_stats(), 'upload': upload_limiter.get_stats()},
+            'bandwidth': {direction: shaper.get_status() for direction, shaper in shapers.items()},
+            'drive_index': drive_sessions.uploader().index.get_stats(),
             'uptime_seconds': time.time() - (time.mktime(datetime.fromisoformat(process_status['start_time']).timetuple()) if process_status.get('start_time') else time.time())
         }
         
@@ -567,35 +669,7 @@ def get_progress():
         # Sync progress from telegram module
         sync_progress_from_telegram()
         
-        progress_data = {
-            'running': process_status['running'],
-            'streaming_active': process_status.get('streaming_active', False),
-            'simultaneous_operations': process_status.get('simultaneous_operations', False),
-            'current_operation': process_status.get('current_operation'),
-            'current_file': process_status.get('current_file'),
-            'download_progress': process_status.get('download_progress', 0),
-            'upload_progress': process_status.get('upload_progress', 0),
-            'total_files': process_status.get('total_files', 0),
-            'processed_files': process_status.get('processed_files', 0),
-            'downloaded_files': process_status.get('downloaded_files', 0),
-            'uploaded_files': process_status.get('uploaded_files', 0),
-            'current_file_size': process_status.get('current_file_size', 0),
-            'downloaded_size': process_status.get('downloaded_size', 0),
-            'uploaded_size': process_status.get('uploaded_size', 0),
-            'download_speed': process_status.get('download_speed', 0),
-            'upload_speed': process_status.get('upload_speed', 0),
-            'memory_usage': process_status.get('memory_usage', 0),
-            'chunk_queue_size': process_status.get('chunk_queue_size', 0),
-            'eta': process_status.get('eta'),
-            'start_time': process_status.get('start_time'),
-            'last_error': process_status.get('last_error'),
-            'last_update': datetime.now().isoformat(),
-            'efficiency_metrics': {
-                'disk_usage': 'minimal (streaming)',
-                'memory_optimization': 'active',
-                'concurrent_operations': process_status.get('simultaneous_operations', False)
-            }
-        }
+        progress_data = build_progress_data()
         
         return jsonify({
             'status': 'success',
@@ -623,12 +697,13 @@ def get_statistics():
     log_request_info()
     
     try:
-        stats = get_stats()
+        include_files = request.args.get('include_files', '').lower() in ('1', 'true', 'yes')
+        stats = get_stats(include_files=include_files)
         
         # Add additional statistics for chunked operations
         enhanced_stats = {
             **stats,
-            'last_updated': datetime.now().isoformat(),
+            'last_updated': stats.get('last_modified'),
             'process_status': {
                 'running': process_status['running'],
                 'current_operation': process_status.get('current_operation'),
@@ -643,10 +718,9 @@ def get_statistics():
             }
         }
         
-        return jsonify({
+        return etag_response({
             'status': 'success',
-            'data': enhanced_stats,
-            'timestamp': datetime.now().isoformat()
+            'data': enhanced_stats
         })
         
     except Exception as e:
@@ -659,6 +733,76 @@ def get_statistics():
         )
 
 
+# ROUTE: Paginated upload listing
+@app.route('/uploads', methods=['GET', 'OPTIONS'])
+def list_uploads():
+    """
+    List uploaded files newest first, one page at a time.
+    Query: cursor, limit, since/until (epoch or ISO date), min_size/max_size (bytes), channel
+    """
+    if request.method == 'OPTIONS':
+        return handle_preflight_response()
+    
+    log_request_info()
+    
+    try:
+        args = request.args
+        page = drive_sessions.uploader().list_uploads(
+            cursor=args.get('cursor') or None,
+            limit=parse_int_arg(args.get('limit')) or 50,
+            since=parse_time_arg(args.get('since')),
+            until=parse_time_arg(args.get('until')),
+            min_size=parse_int_arg(args.get('min_size')),
+            max_size=parse_int_arg(args.get('max_size')),
+            channel=args.get('channel') or None
+        )
+        return etag_response({
+            'status': 'success',
+            'data': page
+        })
+        
+    except ValueError as e:
+        return create_error_response(
+            'bad_request',
+            'Invalid listing parameters',
+            str(e),
+            400,
+            ['Use epoch seconds or ISO dates for since/until', 'Pass next_cursor from the previous page unchanged']
+        )
+    except Exception as e:
+        return create_error_response(
+            'list_error',
+            'Failed to list uploads',
+            str(e),
+            500,
+            ['Check server logs for details']
+        )
+
+
+# ROUTE: Dashboard upload list (first page in the dashboard's format)
+@app.route('/api/list-uploaded', methods=['GET', 'OPTIONS'])
+def list_uploaded_for_dashboard():
+    """Uploaded videos in the shape templates/index.html expects"""
+    if request.method == 'OPTIONS':
+        return handle_preflight_response()
+    
+    try:
+        uploader = drive_sessions.uploader()
+        page = uploader.list_uploads(limit=parse_int_arg(request.args.get('limit')) or 100)
+        return etag_response({
+            'count': uploader.get_uploaded_count(),
+            'videos': [{
+                'filename': item['filename'],
+                'size_mb': round(item['size'] / 1024 / 1024, 1),
+                'uploaded_at': datetime.fromtimestamp(item['uploaded_at']).isoformat(),
+                'drive_id': item['drive_id']
+            } for item in page['items']],
+            'next_cursor': page['next_cursor']
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 # ROUTE: Start upload process (Enhanced for chunked streaming)
 @app.route('/start-upload', methods=['POST', 'OPTIONS'])
 def start_upload():
@@ -690,6 +834,15 @@ def start_upload():
                 ]
             )
         
+        if monitor_state['running']:
+            return create_error_response(
+                'conflict',
+                'Live monitoring is running',
+                'New videos are already being uploaded as they are posted',
+                409,
+                ['Stop monitoring before starting a full upload run']
+            )
+        
         # Check credentials
         credentials_ok, missing_files = check_credentials()
         if not credentials_ok:
@@ -706,15 +859,13 @@ def start_upload():
                 ]
             )
         
-        # Validate required modules
-        try:
-            import telegram_downloader
-            import drive_uploader
-        except ImportError as e:
+        # Validate required modules (the transfer modules import these lazily)
+        missing_modules = missing_dependencies()
+        if missing_modules:
             return create_error_response(
                 'dependency',
                 'Required modules not available',
-                str(e),
+                f'Missing modules: {missing_modules}',
                 500,
                 [
                     'Install missing dependencies',
@@ -808,6 +959,191 @@ def start_upload():
         )
 
 
+# ROUTE: Start live monitoring
+@app.route('/api/start-monitoring', methods=['POST', 'OPTIONS'])
+def start_monitoring():
+    """Start event-driven monitoring that uploads new videos as they are posted"""
+    if request.method == 'OPTIONS':
+        return handle_preflight_response()
+    
+    log_request_info()
+    
+    try:
+        if monitor_state['running']:
+            return create_error_response(
+                'conflict',
+                'Monitoring is already running',
+                f'Watching: {monitor_state["chats"]}',
+                409,
+                ['Stop monitoring before starting it again']
+            )
+        
+        if process_status['running']:
+            return create_error_response(
+                'conflict',
+                'A full upload run is in progress',
+                f'Upload process started at {process_status.get("start_time")}',
+                409,
+                ['Start monitoring after the current run completes']
+            )
+        
+        credentials_ok, missing_files = check_credentials()
+        if not credentials_ok:
+            return create_error_response(
+                'configuration',
+                'Missing required credential files',
+                f'Missing files: {missing_files}',
+                400,
+                ['Ensure credentials.json exists in the project directory']
+            )
+        
+        thread = threading.Thread(target=run_monitor_thread, daemon=True)
+        thread.start()
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Live monitoring started: new videos are uploaded as soon as they are posted',
+            'data': {
+                'mode': 'event_driven',
+                # The dashboard's interval is accepted for compatibility; no polling happens
+                'interval_ignored': (request.get_json(silent=True) or {}).get('interval'),
+                'started_at': datetime.now().isoformat()
+            },
+            'timestamp': datetime.now().isoformat()
+        }), 200
+        
+    except Exception as e:
+        return create_error_response(
+            'startup_error',
+            'Failed to start monitoring',
+            str(e),
+            500,
+            ['Check server logs for detailed error information']
+        )
+
+
+# ROUTE: Stop live monitoring
+@app.route('/api/stop-monitoring', methods=['POST', 'OPTIONS'])
+def stop_monitoring():
+    """Stop the live monitor after its current transfer"""
+    if request.method == 'OPTIONS':
+        return handle_preflight_response()
+    
+    log_request_info()
+    
+    if not stop_monitor():
+        return create_error_response(
+            'not_running',
+            'Monitoring is not running',
+            'There is no active monitor to stop',
+            409,
+            ['Start monitoring first']
+        )
+    
+    return jsonify({
+        'status': 'success',
+        'message': 'Monitoring will stop after the current transfer',
+        'data': {
+            'videos_received': monitor_state['videos_received'],
+            'videos_uploaded': monitor_state['videos_uploaded']
+        },
+        'timestamp': datetime.now().isoformat()
+    }), 200
+
+
+# ROUTE: Bandwidth limits
+@app.route('/api/bandwidth', methods=['GET', 'POST', 'OPTIONS'])
+def bandwidth_limits():
+    """
+    GET: effective download/upload limits and schedules.
+    POST: {"direction": "upload", "limit_mb_s": 10} pins a limit (null = unlimited),
+    {"direction": "upload", "reset": true} returns to the schedule, and
+    {"direction": "upload", "schedule": [{"start": "09:00", "end": "18:00", "mb_s": 20}],
+    "default_mb_s": null} replaces the schedule. Changes apply to running transfers.
+    """
+    if request.method == 'OPTIONS':
+        return handle_preflight_response()
+    
+    log_request_info()
+    
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        shaper = shapers.get(body.get('direction'))
+        if shaper is None:
+            return create_error_response(
+                'bad_request', 'Unknown direction', f"Use one of: {', '.join(shapers)}", 400)
+        try:
+            if body.get('reset'):
+                shaper.clear_override()
+            if 'schedule' in body:
+                shaper.set_schedule(body['schedule'] or [], body.get('default_mb_s'))
+            if 'limit_mb_s' in body:
+                limit = body['limit_mb_s']
+                shaper.set_override(limit)
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            return create_error_response(
+                'bad_request',
+                'Invalid bandwidth settings',
+                str(e),
+                400,
+                ['Limits are positive MB/s or null', 'Schedule windows need "start"/"end" as HH:MM and "mb_s"']
+            )
+        logger.info("Bandwidth settings changed", extra={'direction': shaper.direction, **shaper.get_status()})
+    
+    return jsonify({
+        'status': 'success',
+        'data': {direction: shaper.get_status() for direction, shaper in shapers.items()},
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+# ROUTE: On-demand sampling profile
+@app.route('/debug/profile', methods=['GET', 'OPTIONS'])
+def debug_profile():
+    """
+    Sample every thread's stack (transfer thread, event loop, workers) for
+    ?seconds=N and return collapsed stacks for flamegraph tools.
+    Guarded by PROFILE_TOKEN, accepted only as the X-Profile-Token header so
+    it never reaches the request log, or, when no token is configured, by
+    only answering loopback clients.
+    """
+    if request.method == 'OPTIONS':
+        return handle_preflight_response()
+    
+    log_request_info()
+    
+    if PROFILE_TOKEN:
+        supplied = request.headers.get('X-Profile-Token', '')
+        allowed = hmac.compare_digest(supplied, PROFILE_TOKEN)
+    else:
+        allowed = request.remote_addr in ('127.0.0.1', '::1')
+    if not allowed:
+        return create_error_response(
+            'forbidden',
+            'Profiling is not allowed from this client',
+            'Set PROFILE_TOKEN and send it as X-Profile-Token, or call from localhost',
+            403
+        )
+    
+    try:
+        seconds = float(request.args.get('seconds', 10))
+    except ValueError:
+        return create_error_response('bad_request', 'Invalid seconds parameter', request.args.get('seconds'), 400)
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        return create_error_response(
+            'bad_request', 'seconds out of range', f'Use 0 < seconds <= {PROFILE_MAX_SECONDS}', 400)
+    
+    try:
+        folded = profiler.profile(seconds)
+    except RuntimeError as e:
+        return create_error_response('conflict', 'Profiler busy', str(e), 409, ['Wait for the current profile to finish'])
+    
+    response = make_response(folded)
+    response.headers['Content-Type'] = 'text/plain; charset=utf-8'
+    response.headers['Content-Disposition'] = f'attachment; filename="profile-{time.strftime("%Y%m%d-%H%M%S")}.folded"'
+    return response
+
+
 # ============================================================================
 # HELPER FUNCTION FOR CONSISTENT PREFLIGHT RESPONSES
 # ============================================================================
@@ -853,7 +1189,7 @@ def not_found(error):
         [
             'Check the URL spelling',
             'Verify the API endpoint exists',
-            f'Available endpoints: /, /health, /status, /stats, /start-upload, /progress'
+            f'Available endpoints: /, /health, /status, /stats, /start-upload, /progress, /uploads, /api/start-monitoring, /api/stop-monitoring'
         ]
     )
 
@@ -959,7 +1295,12 @@ if __name__ == '__main__':
     print("   GET  /status    - Process status (with streaming metrics)")
     print("   GET  /progress  - Detailed progress (with chunk info)")
     print("   GET  /stats     - Upload statistics")
+    print("   GET  /uploads   - Paginated upload listing")
     print("   POST /start-upload - Start chunked upload process")
+    print("   POST /api/start-monitoring - Start live monitoring")
+    print("   POST /api/stop-monitoring  - Stop live monitoring")
+    print("   GET  /api/bandwidth - Bandwidth limits (POST to change at runtime)")
+    print("   GET  /debug/profile?seconds=N - Sampling profile (collapsed stacks)")
     
     print("\n🔒 CORS Configuration:")
     print("   ✅ Comprehensive CORS headers configured")
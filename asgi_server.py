@@ -0,0 +1,245 @@
+"""
+ASGI serving mode: API handlers, SSE progress streams and the transfer engine
+share one asyncio event loop, so handlers read transfer state directly and
+no request thread waits on a transfer.
+
+    uvicorn asgi_server:app --host 0.0.0.0 --port 5000
+
+Hot paths (/progress, /events, transfer control) are served natively on the
+loop; every other route falls through to the Flask app via asgiref, on a
+thread pool so a slow route (e.g. /debug/profile) doesn't hold up the rest.
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+import app as flask_app
+from telegram_downloader import monitor, stop_monitor, monitor_state
+
+SSE_INTERVAL = 1.0  # Seconds between progress events on /events
+WSGI_THREADS = 8  # Flask requests served at once
+
+_wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix='wsgi')
+_engine_tasks = set()
+
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs WSGI apps thread-sensitively, i.e. all on one shared thread;
+    # Flask requests are independent, so spread them over a pool instead
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, thread_sensitive=False,
+                                 executor=_wsgi_executor)
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+_wsgi_app = PooledWsgiToAsgi(flask_app.app)
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+    (b'access-control-allow-headers', b'Content-Type, Authorization, Accept, Origin, X-Requested-With, Cache-Control'),
+]
+
+
+async def send_json(send, payload, status=200):
+    body = json.dumps(payload, default=str).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            *CORS_HEADERS
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def error_payload(error_type, message, details, status_code):
+    """Same error shape as app.create_error_response"""
+    return {
+        'status': 'error',
+        'error': {
+            'type': error_type,
+            'message': message,
+            'details': details,
+            'status': status_code,
+            'timestamp': datetime.now().isoformat(),
+            'suggestions': []
+        },
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+def start_engine_task(coro):
+    """Run a transfer coroutine on the shared loop, keeping a reference until it finishes"""
+    task = asyncio.get_running_loop().create_task(coro)
+    _engine_tasks.add(task)
+    task.add_done_callback(_engine_tasks.discard)
+    return task
+
+
+async def _run_transfer():
+    try:
+        await flask_app.run_telegram_process()
+    except Exception as e:
+        # run_telegram_process already recorded the error in process_status
+        print(f"❌ Transfer task ended with error: {e}")
+
+
+async def _run_monitor():
+    try:
+        await monitor()
+    except Exception as e:
+        print(f"❌ Monitor task ended with error: {e}")
+
+
+async def handle_progress(scope, receive, send):
+    flask_app.sync_progress_from_telegram()
+    await send_json(send, {
+        'status': 'success',
+        'data': flask_app.build_progress_data(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+async def handle_events(scope, receive, send):
+    """Server-sent events: one progress snapshot per SSE_INTERVAL until the client disconnects"""
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            *CORS_HEADERS
+        ]
+    })
+
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected.set()
+                return
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        while not disconnected.is_set():
+            flask_app.sync_progress_from_telegram()
+            data = json.dumps(flask_app.build_progress_data(), default=str)
+            await send({'type': 'http.response.body', 'body': f"data: {data}\n\n".encode(), 'more_body': True})
+            try:
+                await asyncio.wait_for(disconnected.wait(), SSE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        watcher.cancel()
+
+
+async def handle_start_upload(scope, receive, send):
+    if flask_app.process_status['running']:
+        await send_json(send, error_payload(
+            'conflict', 'Chunked streaming process is already running',
+            f'Upload process started at {flask_app.process_status.get("start_time")}', 409), 409)
+        return
+    if monitor_state['running']:
+        await send_json(send, error_payload(
+            'conflict', 'Live monitoring is running',
+            'Stop monitoring before starting a full upload run', 409), 409)
+        return
+
+    credentials_ok, missing_files = flask_app.check_credentials()
+    if not credentials_ok:
+        await send_json(send, error_payload(
+            'configuration', 'Missing required credential files', f'Missing files: {missing_files}', 400), 400)
+        return
+
+    # Mark running before the task is scheduled so concurrent requests see it
+    flask_app.process_status.update({'running': True, 'current_operation': 'starting', 'last_error': None})
+    start_engine_task(_run_transfer())
+    await send_json(send, {
+        'status': 'success',
+        'message': 'Video download and upload process started on the server event loop',
+        'mode': 'asgi_shared_loop',
+        'note': 'Use /progress or the /events stream to follow progress',
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+async def handle_start_monitoring(scope, receive, send):
+    if monitor_state['running'] or flask_app.process_status['running']:
+        await send_json(send, error_payload(
+            'conflict', 'A transfer or monitor is already running', 'Stop it first', 409), 409)
+        return
+    start_engine_task(_run_monitor())
+    await send_json(send, {
+        'status': 'success',
+        'message': 'Live monitoring started: new videos are uploaded as soon as they are posted',
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+async def handle_stop_monitoring(scope, receive, send):
+    if not stop_monitor():
+        await send_json(send, error_payload(
+            'not_running', 'Monitoring is not running', 'There is no active monitor to stop', 409), 409)
+        return
+    await send_json(send, {
+        'status': 'success',
+        'message': 'Monitoring will stop after the current transfer',
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+NATIVE_ROUTES = {
+    ('GET', '/progress'): handle_progress,
+    ('GET', '/events'): handle_events,
+    ('POST', '/start-upload'): handle_start_upload,
+    ('POST', '/api/start-monitoring'): handle_start_monitoring,
+    ('POST', '/api/stop-monitoring'): handle_stop_monitoring,
+}
+
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            print("🚀 ASGI server started (transfers share the server event loop)")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            stop_monitor()
+            tasks = list(_engine_tasks)
+            for task in tasks:
+                task.cancel()
+            # Let their finally blocks (disconnect, lease store, trace export) run
+            await asyncio.gather(*tasks, return_exceptions=True)
+            _wsgi_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
+        return
+
+    handler = NATIVE_ROUTES.get((scope.get('method'), scope.get('path')))
+    if handler:
+        await handler(scope, receive, send)
+    else:
+        # Everything else (stats, listings, health, preflight) is served by Flask
+        await _wsgi_app(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=5000)
@@ -0,0 +1,140 @@
+import asyncio
+import math
+import threading
+import time
+from datetime import datetime
+
+# Per-direction limits in MB/s. Schedule windows are local "HH:MM" ranges (an
+# end before the start wraps past midnight); outside every window the default
+# applies. None means unlimited. Example: 20 MB/s uploads during office hours:
+#   'upload': {'default': None, 'schedule': [{'start': '09:00', 'end': '18:00', 'mb_s': 20}]}
+BANDWIDTH_LIMITS = {
+    'download': {'default': None, 'schedule': []},
+    'upload': {'default': None, 'schedule': []},
+}
+BANDWIDTH_BURST_SECONDS = 0.5  # Bucket depth: how far ahead of the rate a transfer may run
+BANDWIDTH_MAX_SLEEP = 0.25  # Longest single pause, so rate changes apply quickly and waits stay short
+
+
+def _minutes(hhmm):
+    hours, minutes = hhmm.split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time of day: {hhmm}")
+    return hours * 60 + minutes
+
+
+def validate_limit(mb_s):
+    """A limit as float MB/s or None (unlimited); raises ValueError for anything else"""
+    if mb_s is None:
+        return None
+    mb_s = float(mb_s)
+    if not (mb_s > 0 and math.isfinite(mb_s)):
+        raise ValueError("limits must be positive MB/s (or null for unlimited)")
+    return mb_s
+
+
+def validate_schedule(schedule):
+    """Check schedule windows; returns them normalized or raises ValueError"""
+    windows = []
+    for window in schedule:
+        mb_s = validate_limit(window.get('mb_s'))
+        _minutes(window['start'])
+        _minutes(window['end'])
+        windows.append({'start': window['start'], 'end': window['end'], 'mb_s': mb_s})
+    return windows
+
+
+class BandwidthShaper:
+    """
+    Token bucket for one transfer direction. Callers report bytes as they move
+    them and are paused in short slices whenever they run ahead of the rate, so
+    a limit slows a transfer down smoothly instead of stopping it. The rate is
+    looked up on every call from the runtime override or the time-of-day
+    schedule, so a new window or API change applies mid-transfer.
+    """
+
+    def __init__(self, direction, default=None, schedule=()):
+        self.direction = direction
+        self.default = validate_limit(default)
+        self.schedule = validate_schedule(schedule)
+        self.override = None  # (mb_s,) when set at runtime; (None,) forces unlimited
+        self.shaped_seconds = 0.0
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+
+    def current_limit(self, now=None):
+        """Effective limit in MB/s (None = unlimited)"""
+        if self.override is not None:
+            return self.override[0]
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        for window in self.schedule:
+            start, end = _minutes(window['start']), _minutes(window['end'])
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                return window['mb_s']
+        return self.default
+
+    def _reserve(self, nbytes):
+        """Take nbytes from the bucket; returns how long the caller must wait"""
+        limit = self.current_limit()
+        with self._lock:
+            now = time.monotonic()
+            if limit is None:
+                self._tokens = 0.0
+                self._updated = now
+                return 0.0
+            rate = limit * 1024 * 1024
+            burst = rate * BANDWIDTH_BURST_SECONDS
+            self._tokens = min(burst, self._tokens + (now - self._updated) * rate) - nbytes
+            self._updated = now
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / rate
+
+    def throttle(self, nbytes):
+        """Blocking form for worker threads (Drive uploads)"""
+        delay = self._reserve(nbytes)
+        while delay > 0:
+            pause = min(delay, BANDWIDTH_MAX_SLEEP)
+            time.sleep(pause)
+            self.shaped_seconds += pause
+            delay = self._reserve(0)
+
+    async def throttle_async(self, nbytes):
+        """Event-loop form (Telegram downloads)"""
+        delay = self._reserve(nbytes)
+        while delay > 0:
+            pause = min(delay, BANDWIDTH_MAX_SLEEP)
+            await asyncio.sleep(pause)
+            self.shaped_seconds += pause
+            delay = self._reserve(0)
+
+    def set_override(self, mb_s):
+        """Pin the limit at runtime (None = unlimited) until clear_override()"""
+        self.override = (validate_limit(mb_s),)
+
+    def clear_override(self):
+        self.override = None
+
+    def set_schedule(self, schedule, default=None):
+        """Replace the schedule and default together; nothing changes if either is invalid"""
+        schedule, default = validate_schedule(schedule), validate_limit(default)
+        self.schedule, self.default = schedule, default
+
+    def get_status(self):
+        return {
+            'limit_mb_s': self.current_limit(),
+            'source': 'override' if self.override is not None else 'schedule',
+            'default_mb_s': self.default,
+            'schedule': self.schedule,
+            'shaped_seconds': round(self.shaped_seconds, 1)
+        }
+
+
+shapers = {direction: BandwidthShaper(direction, config['default'], config['schedule'])
+           for direction, config in BANDWIDTH_LIMITS.items()}
+download_shaper = shapers['download']
+upload_shaper = shapers['upload']
@@ -0,0 +1,98 @@
+# bench_progress_load.py
+"""
+Load test for /progress: many concurrent dashboard clients polling over
+keep-alive connections, optionally while a transfer runs.
+
+    python bench_progress_load.py --clients 300 --seconds 30 --start-upload
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlparse
+
+
+async def http_request(reader, writer, method, host, path):
+    """Send one HTTP/1.1 request on an open connection; returns (status, body)"""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: 0\r\n\r\n".encode())
+    await writer.drain()
+
+    status_line = await reader.readline()
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value.strip())
+    body = await reader.readexactly(length) if length else b''
+    return status, body
+
+
+async def dashboard_client(host, port, path, interval, deadline, latencies, errors):
+    """One dashboard tab: poll path every interval seconds until the deadline"""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        errors.append('connect')
+        return
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status, _ = await http_request(reader, writer, 'GET', host, path)
+            except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+                errors.append(type(e).__name__)
+                return
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status != 200:
+                errors.append(status)
+            await asyncio.sleep(interval)
+    finally:
+        writer.close()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000/progress')
+    parser.add_argument('--clients', type=int, default=300)
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--interval', type=float, default=1.0, help='poll interval per client')
+    parser.add_argument('--start-upload', action='store_true', help='POST /start-upload first so a transfer runs')
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    host, port = url.hostname, url.port or 80
+
+    if args.start_upload:
+        reader, writer = await asyncio.open_connection(host, port)
+        status, body = await http_request(reader, writer, 'POST', host, '/start-upload')
+        writer.close()
+        print(f"🚀 /start-upload -> {status} {body[:120]!r}")
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + args.seconds
+    print(f"⏱️ {args.clients} clients polling {url.path} every {args.interval}s for {args.seconds}s...")
+    await asyncio.gather(*(
+        dashboard_client(host, port, url.path, args.interval, deadline, latencies, errors)
+        for _ in range(args.clients)
+    ))
+
+    if not latencies:
+        print(f"❌ No successful requests ({len(errors)} errors)")
+        return
+    print(f"📊 requests: {len(latencies)}  errors: {len(errors)}  "
+          f"throughput: {len(latencies) / args.seconds:.0f} req/s")
+    print(f"   latency ms  p50 {statistics.median(latencies):.1f}  p95 {percentile(latencies, 0.95):.1f}  "
+          f"p99 {percentile(latencies, 0.99):.1f}  max {max(latencies):.1f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
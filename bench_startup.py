@@ -0,0 +1,110 @@
+# bench_startup.py
+"""
+Import-time benchmark for the read-only startup paths.
+Each scenario runs in a fresh interpreter and reports wall time and whether
+Telethon / google-api-python-client were pulled in (they should not be).
+
+    python bench_startup.py [runs]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ['telethon', 'googleapiclient', 'google_auth_oauthlib', 'google.oauth2']
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = {
+    'import drive_uploader': 'import drive_uploader',
+    'import telegram_downloader': 'import telegram_downloader',
+    'run.show_stats()': 'import run; run.show_stats()',
+    'import app': 'import app',
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+try:
+    {code}
+except ModuleNotFoundError as e:
+    print('__MISSING__' + (e.name or ''))
+    raise
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print('__BENCH__' + json.dumps({{'seconds': elapsed, 'heavy': heavy}}))
+"""
+
+
+def is_third_party(module):
+    """True for a module that isn't one of this project's own files (an optional dependency)"""
+    top = module.split('.')[0]
+    return bool(top) and not os.path.exists(os.path.join(PROJECT_DIR, f"{top}.py"))
+
+
+def run_scenario(code):
+    """
+    Run one scenario in a fresh interpreter. Returns (seconds, heavy modules),
+    (None, [reason]) when a third-party dependency isn't installed, or raises
+    RuntimeError for any other failure (broken project code must not pass as skipped).
+    """
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(code=code, heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, cwd=PROJECT_DIR
+    )
+    missing = None
+    for line in result.stdout.splitlines():
+        if line.startswith('__BENCH__'):
+            data = json.loads(line[len('__BENCH__'):])
+            return data['seconds'], data['heavy']
+        if line.startswith('__MISSING__'):
+            missing = line[len('__MISSING__'):]
+    error = (result.stderr.strip().splitlines() or ['no output'])[-1]
+    if missing is not None and is_third_party(missing):
+        return None, [f"{missing} not installed"]
+    raise RuntimeError(error)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    failed = False
+    broken = False
+
+    print(f"⏱️ Startup benchmark ({runs} runs each, fresh interpreter per run)")
+    print(f"{'scenario':<30} {'best ms':>9} {'median ms':>10}  heavy imports")
+    for name, code in SCENARIOS.items():
+        timings = []
+        heavy = []
+        try:
+            for _ in range(runs):
+                seconds, heavy = run_scenario(code)
+                if seconds is None:
+                    break
+                timings.append(seconds * 1000)
+        except RuntimeError as e:
+            print(f"{name:<30} {'FAILED':>9} {'':>10}  {e}")
+            broken = True
+            continue
+
+        if not timings:
+            print(f"{name:<30} {'skipped':>9} {'':>10}  ({heavy[0]})")
+            continue
+
+        timings.sort()
+        print(f"{name:<30} {timings[0]:>9.1f} {timings[len(timings) // 2]:>10.1f}  {', '.join(heavy) or 'none'}")
+        if heavy:
+            failed = True
+
+    if broken:
+        print("❌ A startup path failed to import (project code error, not a missing dependency)")
+        sys.exit(1)
+    if failed:
+        print("❌ Heavy modules were imported on a read-only path")
+        sys.exit(1)
+    print("✅ No heavy modules imported on read-only paths")
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    main()
+    print(f"Total benchmark time: {time.perf_counter() - start:.1f}s")
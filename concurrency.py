@@ -0,0 +1,131 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+CONCURRENCY_MIN = 1
+CONCURRENCY_MAX = 4  # Per stage; the spool quota and memory governor still bound total in-flight bytes
+CONCURRENCY_START = 1
+CONCURRENCY_WINDOW = 30.0  # Seconds of completed work measured per adjustment
+CONCURRENCY_MIN_SAMPLES = 2  # Completions needed in a window before adjusting
+CONCURRENCY_GAIN = 0.10  # An increase must raise goodput by this fraction to be kept
+CONCURRENCY_BACKOFF = 0.5  # Multiplicative decrease on errors/throttling
+CONCURRENCY_ERROR_RATE = 0.2  # Failure share within a window that triggers a decrease
+CONCURRENCY_HOLD_WINDOWS = 4  # Windows to stay put after an increase didn't pay off
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one transfer stage (downloads or uploads).
+    Each window compares completed goodput (bytes/s) with the previous one:
+    the limit grows by one while that keeps paying off, steps back when an
+    increase bought nothing, and halves when errors or flood waits show up.
+    """
+
+    def __init__(self, name, minimum=CONCURRENCY_MIN, maximum=CONCURRENCY_MAX, start=CONCURRENCY_START):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = start
+        self.active = 0
+        self.peak_active = 0
+        self.goodput = 0.0  # MB/s over the last window
+        self.adjustments = []
+        self._window_start = time.monotonic()
+        self._bytes = 0
+        self._completed = 0
+        self._failed = 0
+        self._throttled = 0
+        self._last_goodput = None
+        self._last_change = 0
+        self._hold = 0
+        self._changed = None
+
+    def reset(self):
+        """Prepare for a new run on a new event loop, keeping the limit learned so far"""
+        self.active = self.peak_active = 0
+        self._changed = None
+        self._window_start = time.monotonic()
+        self._bytes = self._completed = self._failed = self._throttled = 0
+
+    def _condition(self):
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    @asynccontextmanager
+    async def slot(self):
+        """Run one stage operation once the current limit allows it"""
+        changed = self._condition()
+        async with changed:
+            await changed.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+        try:
+            yield
+        finally:
+            async with changed:
+                self.active -= 1
+                changed.notify_all()
+
+    def record(self, nbytes=0, failed=False, throttled=False):
+        """Report one finished operation; adjusts the limit at the end of each window"""
+        self._bytes += nbytes
+        self._completed += 1
+        self._failed += 1 if failed else 0
+        self._throttled += 1 if throttled else 0
+        elapsed = time.monotonic() - self._window_start
+        if throttled or (elapsed >= CONCURRENCY_WINDOW and self._completed >= CONCURRENCY_MIN_SAMPLES):
+            self._adjust(elapsed)
+
+    def _adjust(self, elapsed):
+        goodput = self._bytes / max(elapsed, 1e-6) / 1024 / 1024
+        error_rate = (self._failed + self._throttled) / self._completed
+        previous = self.limit
+
+        if self._throttled or error_rate >= CONCURRENCY_ERROR_RATE:
+            self.limit = max(self.minimum, int(self.limit * CONCURRENCY_BACKOFF))
+            reason = 'throttled' if self._throttled else 'errors'
+        elif self._last_change > 0 and self._last_goodput and goodput < self._last_goodput * (1 + CONCURRENCY_GAIN):
+            # The last increase didn't pay for itself: settle one step lower
+            self.limit = max(self.minimum, self.limit - 1)
+            self._hold = CONCURRENCY_HOLD_WINDOWS
+            reason = 'no_gain'
+        elif self._hold:
+            self._hold -= 1
+            reason = 'hold'
+        elif self.peak_active >= self.limit:
+            self.limit = min(self.maximum, self.limit + 1)
+            reason = 'probe'
+        else:
+            reason = 'hold'
+
+        self._last_change = self.limit - previous
+        self._last_goodput = goodput
+        self.goodput = round(goodput, 2)
+        if self.limit != previous:
+            self.adjustments.append({'at': time.time(), 'from': previous, 'to': self.limit,
+                                     'reason': reason, 'goodput_mb_s': self.goodput})
+            del self.adjustments[:-20]
+            print(f"🎛️ {self.name} concurrency {previous} → {self.limit} ({reason}, {self.goodput} MB/s)")
+            if self._changed is not None and self.limit > previous:
+                asyncio.get_running_loop().create_task(self._wake())
+
+        self._window_start = time.monotonic()
+        self._bytes = self._completed = self._failed = self._throttled = 0
+        self.peak_active = self.active
+
+    async def _wake(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    def get_stats(self):
+        return {
+            'limit': self.limit,
+            'active': self.active,
+            'goodput_mb_s': self.goodput,
+            'recent_adjustments': self.adjustments[-5:]
+        }
+
+
+download_limiter = AdaptiveLimiter('download')
+upload_limiter = AdaptiveLimiter('upload')
@@ -0,0 +1,91 @@
+import asyncio
+import mmap
+import os
+import struct
+
+
+def _map_file(path):
+    """Open a read-only mapping of a spooled file (None for empty files)"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _iter_boxes(data, start, end):
+    """Yield (type, payload_start, box_end) for ISO-BMFF boxes in data[start:end]"""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box_type, offset + header, min(offset + size, end)
+        offset += size
+
+
+def probe_video_metadata(path):
+    """Stage: read duration and container brand from an MP4 without decoding it"""
+    info = {'duration': None, 'brand': None}
+    mapped = _map_file(path)
+    if mapped is None:
+        return info
+    with mapped:
+        for box_type, payload, box_end in _iter_boxes(mapped, 0, len(mapped)):
+            if box_type == b'ftyp' and payload + 4 <= box_end:
+                info['brand'] = bytes(mapped[payload:payload + 4]).decode('ascii', 'replace').strip()
+            elif box_type == b'moov':
+                for child, child_payload, child_end in _iter_boxes(mapped, payload, box_end):
+                    if child != b'mvhd':
+                        continue
+                    version = mapped[child_payload]
+                    if version == 1 and child_payload + 32 <= child_end:
+                        timescale, duration = struct.unpack_from('>IQ', mapped, child_payload + 20)
+                    elif child_payload + 20 <= child_end:
+                        timescale, duration = struct.unpack_from('>II', mapped, child_payload + 12)
+                    else:
+                        break
+                    if timescale:
+                        info['duration'] = round(duration / timescale, 3)
+                    break
+                break
+    return info
+
+
+class CpuStagePool:
+    """
+    ProcessPoolExecutor-backed stages for CPU-heavy per-file work, so it
+    scales with cores and never runs on the asyncio transfer thread. Hashing
+    happens on each download's HashingWriter thread; the pool runs the probe.
+    Stage functions receive the spool file path and map it themselves.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def run(self, stage, *args):
+        """Run a module-level stage function in the pool and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), stage, *args)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+cpu_pool = CpuStagePool()
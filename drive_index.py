@@ -0,0 +1,208 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+DRIVE_INDEX_FILE = 'drive_folder_index.json'
+DRIVE_INDEX_MAX_AGE = 60  # Seconds before lookups pull the next Changes delta
+DRIVE_INDEX_SAVE_INTERVAL = 30  # Local edits (uploads, new folders) are written at most this often
+FILE_FIELDS = 'id, name, size, md5Checksum, parents, trashed, createdTime, mimeType'
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+PAGE_SIZE = 1000
+
+
+class DriveFolderIndex:
+    """
+    Persistent local index of the destination folders' contents. It is built
+    with one listing per folder and then kept current from the Drive Changes
+    feed with a stored page token, so deletes, renames and uploads made
+    elsewhere arrive as deltas instead of requiring a relist.
+    Local edits are saved in batches (after a sync, at most every
+    DRIVE_INDEX_SAVE_INTERVAL and at exit). The stored page token always
+    matches the stored files, so edits lost in a crash are replayed from the feed.
+    """
+
+    def __init__(self, path=DRIVE_INDEX_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self.page_token = None
+        self.folders = []  # Folder ids whose children are indexed
+        self.roots = {}  # Top-level destination folder name -> id
+        self.paths = {}  # Layout subfolder path ('channel/2024/05') -> id
+        self.files = {}  # id -> {name, size, md5, parents, created, folder}
+        self.synced_at = 0
+        self._dirty = False
+        self._saved_at = time.time()
+        self._load()
+        atexit.register(self.flush)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.page_token = state.get('page_token')
+        self.folders = state.get('folders', [])
+        self.roots = state.get('roots', {})
+        self.paths = state.get('paths', {})
+        self.files = state.get('files', {})
+
+    def save(self):
+        with self._lock:
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'page_token': self.page_token, 'folders': self.folders, 'roots': self.roots,
+                           'paths': self.paths, 'files': self.files}, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            self._saved_at = time.time()
+
+    def _changed(self):
+        """Note a local edit; the index is written once the save interval has passed"""
+        self._dirty = True
+        if time.time() - self._saved_at >= DRIVE_INDEX_SAVE_INTERVAL:
+            self.save()
+
+    def flush(self):
+        """Write any batched edits now (shutdown)"""
+        with self._lock:
+            if self._dirty:
+                self.save()
+
+    @staticmethod
+    def _entry(info):
+        return {
+            'name': info['name'],
+            'size': int(info.get('size') or 0),
+            'md5': info.get('md5Checksum'),
+            'parents': info.get('parents', []),
+            'created': info.get('createdTime'),
+            'folder': info.get('mimeType') == FOLDER_MIME
+        }
+
+    def track(self, service, folder_id, root_name=None, path=None):
+        """Index another folder's children (one listing), keeping the existing change token"""
+        with self._lock:
+            if root_name:
+                self.roots[root_name] = folder_id
+            if path:
+                self.paths[path] = folder_id
+            if folder_id in self.folders:
+                self._changed()
+                return
+            if self.page_token is None:
+                self.page_token = service.changes().getStartPageToken().execute()['startPageToken']
+            self._list_children(service, folder_id)
+            self.folders.append(folder_id)
+            self._changed()
+
+    def _list_children(self, service, folder_id):
+        page_token = None
+        while True:
+            results = service.files().list(
+                q=f"'{folder_id}' in parents and trashed=false",
+                fields=f'nextPageToken, files({FILE_FIELDS})',
+                pageSize=PAGE_SIZE,
+                pageToken=page_token
+            ).execute()
+            for info in results.get('files', []):
+                self.files[info['id']] = self._entry(info)
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return
+
+    def _rebuild(self, service):
+        """Start over from a fresh token and one listing per folder (token expired or index lost)"""
+        folders = list(self.folders)
+        self.page_token = service.changes().getStartPageToken().execute()['startPageToken']
+        self.files = {}
+        for folder_id in folders:
+            self._list_children(service, folder_id)
+
+    def sync(self, service, force=False):
+        """Apply the Changes delta since the stored token; returns the number of changes applied"""
+        from googleapiclient.errors import HttpError
+
+        with self._lock:
+            if not self.folders or (not force and time.time() - self.synced_at < DRIVE_INDEX_MAX_AGE):
+                return 0
+            applied = 0
+            try:
+                page_token = self.page_token
+                while page_token:
+                    results = service.changes().list(
+                        pageToken=page_token,
+                        spaces='drive',
+                        pageSize=PAGE_SIZE,
+                        fields=f'nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}))'
+                    ).execute()
+                    for change in results.get('changes', []):
+                        applied += self._apply(change)
+                    if results.get('newStartPageToken'):
+                        self.page_token = results['newStartPageToken']
+                    page_token = results.get('nextPageToken')
+            except HttpError as e:
+                if e.resp.status not in (400, 404, 410):
+                    raise
+                print(f"⚠️ Drive change token rejected ({e.resp.status}), rebuilding folder index")
+                self._rebuild(service)
+                applied = len(self.files)
+            self.synced_at = time.time()
+            if applied or self._dirty:
+                self.save()
+            return applied
+
+    def _apply(self, change):
+        file_id = change.get('fileId')
+        info = change.get('file')
+        gone = change.get('removed') or not info or info.get('trashed')
+        if gone and file_id in self.folders:
+            # An indexed folder was deleted: stop following it and drop its children
+            self.folders.remove(file_id)
+            self.roots = {name: folder for name, folder in self.roots.items() if folder != file_id}
+            self.paths = {path: folder for path, folder in self.paths.items() if folder != file_id}
+            self.files = {fid: entry for fid, entry in self.files.items() if file_id not in entry['parents']}
+            return 1
+        if gone:
+            return 1 if self.files.pop(file_id, None) else 0
+        if any(parent in self.folders for parent in info.get('parents', [])):
+            self.files[file_id] = self._entry(info)
+            return 1
+        # Moved out of every indexed folder
+        return 1 if self.files.pop(file_id, None) else 0
+
+    def add(self, info):
+        """Record a file we just created, ahead of the change feed reporting it"""
+        with self._lock:
+            self.files[info['id']] = self._entry(info)
+            self._changed()
+
+    def remove(self, file_id):
+        with self._lock:
+            if self.files.pop(file_id, None):
+                self._changed()
+
+    def is_tracked(self, folder_id):
+        return folder_id in self.folders
+
+    def children(self, folder_id, folders=False):
+        """Indexed entries (with their ids) directly inside folder_id"""
+        with self._lock:
+            return [{'id': file_id, **entry} for file_id, entry in self.files.items()
+                    if folder_id in entry['parents'] and entry['folder'] == folders]
+
+    def all_files(self):
+        """Every indexed non-folder entry (with its id), across all tracked folders"""
+        with self._lock:
+            return [{'id': file_id, **entry} for file_id, entry in self.files.items() if not entry['folder']]
+
+    def names_in(self, folder_id):
+        with self._lock:
+            return {entry['name'] for entry in self.files.values() if folder_id in entry['parents']}
+
+    def get_stats(self):
+        with self._lock:
+            return {'folders': len(self.folders), 'layout_paths': len(self.paths), 'files': len(self.files),
+                    'synced_at': self.synced_at or None, 'has_token': self.page_token is not None}
@@ -1,61 +1,135 @@
+import io
 import os
 import json
+import base64
+import bisect
 import time
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.errors import HttpError
+import threading
+import logging
+from datetime import datetime
+
+from logging_config import RateLimitedLog
+from tracing import tracer
+from bandwidth import upload_shaper
+from drive_index import DriveFolderIndex, FOLDER_MIME
+
+# google-api-python-client and google-auth are imported inside the methods that
+# talk to Drive, so tracker-only uses (stats, listings) start without them
 
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 GDRIVE_FOLDER_NAME = 'Telegram Videos'
 UPLOADED_TRACKER = 'uploaded_videos.json'
+TOKEN_FILE = 'token.json'
+LIST_PAGE_MAX = 500  # Largest page list_uploads will return
+TOKEN_REFRESH_MARGIN = 300  # Refresh the token this many seconds before it expires
+TOKEN_REFRESH_RETRY = 60  # Seconds between attempts when a refresh fails
+INTEGRITY_RETRIES = 3  # Upload attempts before giving up on an md5 mismatch
+FOLDER_PAGE_SIZE = 1000  # Drive's maximum page size for files.list
+MULTIPART_THRESHOLD = 5 * 1024 * 1024  # Smaller files go up in one multipart request instead of a resumable session
+# Subfolders under GDRIVE_FOLDER_NAME, keeping each Drive folder small. Fields:
+# {channel}, {yyyy}, {mm}, {dd} (message date, else upload time). '' uploads flat.
+FOLDER_LAYOUT = '{channel}/{yyyy}/{mm}'
+
+transfer_logger = logging.getLogger('teletodrive.transfer')
+_discovery_doc = None
+
+
+def get_discovery_doc():
+    """Parsed Drive v3 discovery document from the library's bundled copy, cached per process"""
+    global _discovery_doc
+    if _discovery_doc is None:
+        from googleapiclient.discovery_cache import get_static_doc
+        doc = get_static_doc('drive', 'v3')
+        _discovery_doc = json.loads(doc) if doc else None
+    return _discovery_doc
+
+
+def entry_time(info):
+    """Upload time of a tracker entry as epoch seconds (handles the legacy 'uploaded_at' field)"""
+    if info.get('upload_date'):
+        return info['upload_date']
+    try:
+        return datetime.fromisoformat(info['uploaded_at']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+
+def entry_size(info):
+    """Size of a tracker entry in bytes (handles the legacy 'size' field)"""
+    return info.get('file_size', info.get('size', 0)) or 0
+
+
+def entry_md5(info):
+    """Content md5 of a tracker entry ('hash' is the legacy field)"""
+    return info.get('md5', info.get('hash'))
+
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(list(position)).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        uploaded_at, name = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (uploaded_at, name)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def layout_path(details=None, layout=FOLDER_LAYOUT):
+    """Subfolder path for a file under the layout template ('' = the top folder)"""
+    if not layout:
+        return ''
+    details = details or {}
+    when = datetime.fromtimestamp(details.get('date') or time.time())
+    fields = {
+        'channel': str(details.get('channel') or 'unknown'),
+        'yyyy': f"{when.year:04d}",
+        'mm': f"{when.month:02d}",
+        'dd': f"{when.day:02d}"
+    }
+    parts = [part.format(**fields).replace('/', '_').strip() for part in layout.split('/')]
+    return '/'.join(part for part in parts if part)
+
+
+class IntegrityError(Exception):
+    """Raised when the Drive copy never matches the bytes received from Telegram"""
+
+
+class TransferAborted(Exception):
+    """Raised when the caller withdraws an upload mid-way (e.g. its lease was taken over)"""
+
 
 class DriveUploader:
     def __init__(self, progress_callback=None):
         self.service = None
         self.folder_id = None
+        self.index = DriveFolderIndex()
+        self._lock = threading.RLock()
+        self._folder_lock = threading.Lock()
+        self._tracker_mtime = None
         self.uploaded = self.load_tracker()
+        self._rebuild_index()
         self.progress_callback = progress_callback
 
     def authenticate(self):
-        """Authenticate with Google Drive API"""
+        """Borrow this thread's Drive service from the shared session registry"""
         print("🔐 Starting Google Drive authentication...")
-        creds = None
-        
-        if os.path.exists('token.json'):
-            try:
-                creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-            except Exception as e:
-                print(f"❌ Error loading token: {e}")
-                if os.path.exists('token.json'):
-                    os.remove('token.json')
-                creds = None
-        
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                try:
-                    creds.refresh(Request())
-                except Exception as e:
-                    print(f"❌ Error refreshing token: {e}")
-                    creds = None
-            
-            if not creds:
-                if not os.path.exists('credentials.json'):
-                    raise FileNotFoundError("❌ credentials.json not found")
-                flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-                creds = flow.run_local_server(port=0)
-            
-            with open('token.json', 'w') as token:
-                token.write(creds.to_json())
-        
-        self.service = build('drive', 'v3', credentials=creds)
+        self.service = drive_sessions.service()
         print("✅ Google Drive authenticated!")
 
     def create_folder(self):
         """Create or find the target folder in Google Drive"""
         print(f"📁 Checking for Google Drive folder: {GDRIVE_FOLDER_NAME}")
+        folder_id = self.index.roots.get(GDRIVE_FOLDER_NAME)
+        if folder_id:
+            # The Changes delta drops the folder from the index if it was deleted meanwhile
+            self.sync_index(force=True)
+            if self.index.is_tracked(folder_id):
+                self.folder_id = folder_id
+                print(f"✅ Using existing folder: {GDRIVE_FOLDER_NAME} (from folder index)")
+                return
+        
         results = self.service.files().list(
             q=f"name='{GDRIVE_FOLDER_NAME}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
         ).execute()
@@ -71,97 +145,463 @@ class DriveUploader:
             }).execute()
             self.folder_id = folder.get('id')
             print(f"✅ Created new folder: {GDRIVE_FOLDER_NAME}")
+        self.index.track(self.service, self.folder_id, root_name=GDRIVE_FOLDER_NAME)
+
+    def sync_index(self, force=False):
+        """Bring the folder index up to date from the Changes feed (rate-limited unless forced)"""
+        try:
+            return self.index.sync(drive_sessions.service(), force=force)
+        except Exception as e:
+            print(f"⚠️ Could not sync Drive folder index: {e}")
+            return 0
+
+    def folder_for(self, details=None):
+        """
+        (folder id, layout path) for a file under FOLDER_LAYOUT, creating missing
+        subfolders. Paths resolve from the index's path -> id map, so a known
+        folder costs no API call; only new folders are looked up or created.
+        """
+        path = layout_path(details)
+        if not path:
+            return self.folder_id, path
+        with self._folder_lock:
+            parent = self.folder_id
+            parts = path.split('/')
+            resolved = False  # Once a level is re-resolved, cached ids below it may belong to an old copy
+            for depth, name in enumerate(parts, 1):
+                prefix = '/'.join(parts[:depth])
+                cached = self.index.paths.get(prefix)
+                if cached and not resolved and self.index.is_tracked(cached):
+                    parent = cached
+                    continue
+                resolved = True
+                parent = self._ensure_folder(parent, name)
+                self.index.track(drive_sessions.service(), parent, path=prefix)
+            return parent, path
+
+    def _find_folders(self, parent, name, fresh=False):
+        """Subfolders called name inside parent, oldest first (fresh: ask Drive, not the index)"""
+        if self.index.is_tracked(parent) and not fresh:
+            self.sync_index()
+            folders = [f for f in self.index.children(parent, folders=True) if f['name'] == name]
+        else:
+            escaped = name.replace("\\", "\\\\").replace("'", "\\'")
+            results = drive_sessions.service().files().list(
+                q=f"name='{escaped}' and '{parent}' in parents and mimeType='{FOLDER_MIME}' and trashed=false",
+                fields='files(id, createdTime)'
+            ).execute()
+            folders = [{'id': f['id'], 'created': f.get('createdTime')} for f in results.get('files', [])]
+        return sorted(folders, key=lambda f: (f.get('created') or '', f['id']))
+
+    def _ensure_folder(self, parent, name):
+        """
+        Find or create one subfolder. Another worker or host may create the
+        same folder at the same moment, so after creating we list again and
+        everyone settles on the oldest copy; a losing copy is removed while
+        still empty.
+        """
+        existing = self._find_folders(parent, name)
+        if existing:
+            return existing[0]['id']
+
+        created = drive_sessions.service().files().create(
+            body={'name': name, 'mimeType': FOLDER_MIME, 'parents': [parent]},
+            fields='id, name, parents, createdTime, mimeType'
+        ).execute()
+        self.index.add(created)
+
+        twins = self._find_folders(parent, name, fresh=True)
+        winner = twins[0]['id'] if twins else created['id']
+        if winner != created['id']:
+            print(f"📁 Folder {name} was created concurrently, using the existing copy")
+            self._delete_quietly(created['id'])
+        else:
+            print(f"📁 Created folder: {name}")
+        return winner
+
+    def track_tree(self):
+        """Index every layout subfolder below the top folder (reconcile needs the whole tree)"""
+        service = drive_sessions.service()
+        pending = [(self.folder_id, '')]
+        while pending:
+            folder_id, path = pending.pop()
+            for sub in self.index.children(folder_id, folders=True):
+                sub_path = f"{path}/{sub['name']}" if path else sub['name']
+                # Duplicate names (a lost creation race elsewhere) are indexed but don't take over the path
+                claimed = self.index.is_tracked(self.index.paths.get(sub_path))
+                self.index.track(service, sub['id'], path=None if claimed else sub_path)
+                pending.append((sub['id'], sub_path))
 
     def load_tracker(self):
         """Load dict of already uploaded files"""
         if os.path.exists(UPLOADED_TRACKER):
             try:
+                self._tracker_mtime = os.path.getmtime(UPLOADED_TRACKER)
                 with open(UPLOADED_TRACKER, 'r') as f:
                     return json.load(f)
             except Exception:
                 return {}
         return {}
 
+    def refresh_tracker(self):
+        """Reload the tracker only if another process changed it since we last read or wrote it"""
+        try:
+            mtime = os.path.getmtime(UPLOADED_TRACKER)
+        except OSError:
+            return
+        if mtime != self._tracker_mtime:
+            with self._lock:
+                merged = self.load_tracker()
+                merged.update(self.uploaded)
+                self.uploaded = merged
+                self._rebuild_index()
+
     def save_tracker(self):
-        """Save upload record to disk"""
+        """Save upload record to disk, merging entries written by other workers"""
         try:
-            with open(UPLOADED_TRACKER, 'w') as f:
-                json.dump(self.uploaded, f, indent=2)
+            with self._lock:
+                known = len(self.uploaded)
+                merged = self.load_tracker()
+                merged.update(self.uploaded)
+                self.uploaded = merged
+                if len(merged) != known:
+                    # Other workers added entries since our last read
+                    self._rebuild_index()
+                tmp_path = f"{UPLOADED_TRACKER}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(self.uploaded, f, indent=2)
+                os.replace(tmp_path, UPLOADED_TRACKER)
+                self._tracker_mtime = os.path.getmtime(UPLOADED_TRACKER)
         except Exception as e:
             print(f"⚠️ Error saving tracker file: {e}")
 
+    def _rebuild_index(self):
+        """Recompute running totals and the date/hash indexes from the full tracker"""
+        with self._lock:
+            self._total_size = sum(entry_size(info) for info in self.uploaded.values())
+            self._by_date = sorted((entry_time(info), name) for name, info in self.uploaded.items())
+            self._by_md5 = {}
+            for name, info in self.uploaded.items():
+                md5 = entry_md5(info)
+                if md5:
+                    self._by_md5.setdefault(md5, name)
+
+    def _record(self, filename, entry):
+        """Add a tracker entry, updating totals and indexes incrementally, and persist it"""
+        with self._lock:
+            previous = self.uploaded.get(filename)
+            if previous is not None:
+                self._total_size -= entry_size(previous)
+                self._by_date.remove((entry_time(previous), filename))
+            self.uploaded[filename] = entry
+            self._total_size += entry_size(entry)
+            bisect.insort(self._by_date, (entry_time(entry), filename))
+            md5 = entry_md5(entry)
+            if md5:
+                self._by_md5.setdefault(md5, filename)
+        self.save_tracker()
+
     def is_uploaded(self, filename):
         """Check if file was already uploaded"""
         return filename in self.uploaded
 
-    def upload_file(self, file_path, filename):
+    def find_by_hash(self, md5):
+        """Return the tracked filename with this content hash, if any"""
+        if not md5:
+            return None
+        return self._by_md5.get(md5)
+
+    def record_duplicate(self, filename, duplicate_of, details=None):
+        """Track a file whose content is already in Drive under another name"""
+        original = self.uploaded[duplicate_of]
+        entry = {
+            'drive_id': original.get('drive_id'),
+            'drive_name': original.get('drive_name', duplicate_of),
+            'upload_date': time.time(),
+            'file_size': entry_size(original),
+            'md5': entry_md5(original),
+            'duplicate_of': duplicate_of
+        }
+        if details:
+            if details.get('duration') is not None:
+                entry['duration'] = details['duration']
+            if details.get('channel'):
+                entry['channel'] = details['channel']
+        self._record(filename, entry)
+
+    def reconcile(self, records, channel=None):
+        """
+        Rebuild missing tracker entries from the Drive folder in bulk.
+        records: channel message records ({'id', 'title', 'size'}, as kept by
+        the metadata cache). Drive files come from the folder index across the
+        whole FOLDER_LAYOUT tree, so this costs one listing per folder on a
+        fresh host and only a Changes delta after. A message matches the Drive file with its upload
+        name and size; failing that (renamed or "name (1).mp4" uploads), a size
+        that exactly one message and one unclaimed Drive file share. Drive files
+        no message matches are tracked under their Drive name. Drive's md5 goes
+        into every entry, so content dedup works for the imported files too.
+        """
+        self.sync_index(force=True)
+        self.track_tree()
+        drive_files = self.index.all_files()
+        folder_paths = {folder_id: path for path, folder_id in self.index.paths.items()}
+        by_name = {info['name']: info for info in drive_files}
+        by_size = {}
+        for info in drive_files:
+            by_size.setdefault(info['size'], []).append(info)
+        message_sizes = {}
+        for record in records:
+            message_sizes[record['size']] = message_sizes.get(record['size'], 0) + 1
+        
+        with self._lock:
+            claimed = {info.get('drive_id') for info in self.uploaded.values() if info.get('drive_id')}
+        imported = {}
+        stats = {'drive_files': len(drive_files), 'already_tracked': 0, 'matched_by_name': 0,
+                 'matched_by_size': 0, 'drive_only': 0, 'not_in_drive': 0, 'drive_duplicates': 0}
+        
+        def entry_for(info, how, record=None):
+            entry = {
+                'drive_id': info['id'],
+                'drive_name': info['name'],
+                'upload_date': datetime.fromisoformat(info['created'].replace('Z', '+00:00')).timestamp()
+                               if info.get('created') else time.time(),
+                'file_size': info['size'],
+                'reconciled': how
+            }
+            if info.get('md5'):
+                entry['md5'] = info['md5']
+            for parent in info['parents']:
+                if parent in folder_paths:
+                    entry['folder'] = folder_paths[parent]
+            if channel and record is not None:
+                entry['channel'] = channel
+            return entry
+        
+        for record in records:
+            filename = f"{record['title']}.mp4"
+            if filename in self.uploaded:
+                stats['already_tracked'] += 1
+                continue
+            info, how = by_name.get(filename), 'name'
+            if info is None or info['size'] != record['size'] or info['id'] in claimed:
+                candidates = [f for f in by_size.get(record['size'], []) if f['id'] not in claimed]
+                unique = len(candidates) == 1 and message_sizes[record['size']] == 1
+                info, how = (candidates[0] if unique else None), 'size'
+            if info is None:
+                stats['not_in_drive'] += 1
+                continue
+            claimed.add(info['id'])
+            imported[filename] = entry_for(info, how, record)
+            stats[f'matched_by_{how}'] += 1
+        
+        for info in drive_files:
+            if info['id'] in claimed or info['name'] in self.uploaded or info['name'] in imported:
+                continue
+            imported[info['name']] = entry_for(info, 'drive_only')
+            stats['drive_only'] += 1
+        
+        md5_counts = {}
+        for info in drive_files:
+            if info.get('md5'):
+                md5_counts[info['md5']] = md5_counts.get(info['md5'], 0) + 1
+        stats['drive_duplicates'] = sum(count - 1 for count in md5_counts.values())
+        
+        if imported:
+            with self._lock:
+                self.uploaded.update(imported)
+                self._rebuild_index()
+            self.save_tracker()
+        stats['imported'] = len(imported)
+        return stats
+
+    def upload_file(self, file_path, filename, details=None, spool=None, keep_going=None):
         """
         Memory-safe upload using MediaFileUpload (streams directly from disk)
         This NEVER loads the full file into memory
+        details: optional hashes/metadata computed while downloading. When an md5
+        is present the Drive copy is verified against it and re-uploaded on mismatch.
+        spool: optional SpoolFile for file_path; chunks are then served as
+        memoryview slices of its mapping instead of being read from disk again.
+        keep_going: optional callable(confirm=False) checked between chunks and,
+        with confirm=True, once more before recording; when it returns False the
+        upload stops, any finished Drive copy is deleted and TransferAborted is raised.
         """
         try:
             if not os.path.exists(file_path):
                 raise FileNotFoundError(f"File not found: {file_path}")
             
-            file_size = os.path.getsize(file_path)
-            final_filename = self._get_unique_filename(filename)
-            
-            print(f"📤 Uploading: {final_filename} ({file_size / 1024 / 1024:.1f} MB)")
+            file_size = spool.length if spool else os.path.getsize(file_path)
+            with tracer.span('unique_name'):
+                folder_id, folder_path = self.folder_for(details)
+                final_filename = self._get_unique_filename(filename, folder_id)
+            expected_md5 = (details or {}).get('hashes', {}).get('md5')
             
-            # Use MediaFileUpload - this streams directly from disk without loading into RAM
-            media = MediaFileUpload(
-                file_path,
-                mimetype='video/mp4',
-                resumable=True,
-                chunksize=1024*1024  # 1MB chunks - keeps memory usage minimal
-            )
-            
-            file_metadata = {
-                'name': final_filename,
-                'parents': [self.folder_id]
-            }
+            response = None
+            for attempt in range(1, INTEGRITY_RETRIES + 1):
+                print(f"📤 Uploading: {final_filename} ({file_size / 1024 / 1024:.1f} MB)")
+                with tracer.span('upload', bytes=file_size, attempt=attempt, retries=1 if attempt > 1 else 0):
+                    response = self._upload_once(file_path, final_filename, file_size, spool, folder_id, keep_going)
+                
+                if not expected_md5 or response.get('md5Checksum') == expected_md5:
+                    break
+                
+                print(f"\n⚠️ Checksum mismatch on attempt {attempt}/{INTEGRITY_RETRIES}: "
+                      f"expected {expected_md5}, Drive has {response.get('md5Checksum')}")
+                self._delete_quietly(response.get('id'))
+                response = None
             
-            request = self.service.files().create(
-                body=file_metadata,
-                media_body=media
-            )
+            if response is None:
+                raise IntegrityError(f"Drive copy of {final_filename} failed md5 verification")
             
-            response = None
-            start_time = time.time()
+            if keep_going and not keep_going(confirm=True):
+                self._delete_quietly(response.get('id'))
+                raise TransferAborted(f"Upload of {final_filename} withdrawn before recording")
             
-            while response is None:
-                status, response = request.next_chunk()
-                if status:
-                    progress = int(status.progress() * 100)
-                    elapsed = max(1e-6, time.time() - start_time)
-                    speed = (status.resumable_progress / elapsed) / 1024 / 1024  # MB/s
-                    
-                    print(f"\rUpload Progress: {progress}% ({speed:.1f} MB/s)", end='', flush=True)
-                    
-                    if self.progress_callback:
-                        self.progress_callback('uploading', final_filename, progress, file_size, status.resumable_progress, speed)
+            self.index.add({'id': response.get('id'), 'name': final_filename, 'size': file_size,
+                            'md5Checksum': response.get('md5Checksum'), 'parents': [folder_id],
+                            'createdTime': datetime.utcnow().isoformat() + 'Z'})
             
             # Save to tracker
-            self.uploaded[filename] = {
+            entry = {
                 'drive_id': response.get('id'),
                 'drive_name': final_filename,
                 'upload_date': time.time(),
                 'file_size': file_size
             }
-            self.save_tracker()
+            if folder_path:
+                entry['folder'] = folder_path
+            if details:
+                for algorithm, digest in details.get('hashes', {}).items():
+                    entry[algorithm] = digest
+                if details.get('duration') is not None:
+                    entry['duration'] = details['duration']
+                if details.get('channel'):
+                    entry['channel'] = details['channel']
+            if expected_md5:
+                entry['verified'] = True
+            self._record(filename, entry)
             
-            print(f"\n✅ Upload completed: {final_filename}")
+            print(f"\n✅ Upload completed: {final_filename}" + (" (md5 verified)" if expected_md5 else ""))
             return response.get('id')
             
         except Exception as e:
             print(f"\n❌ Upload failed: {e}")
             raise
 
-    def _get_unique_filename(self, filename):
-        """Generate unique filename if file exists"""
+    def _upload_once(self, file_path, final_filename, file_size, spool=None, folder_id=None, keep_going=None):
+        """
+        Run one upload and return Drive's response (id, md5Checksum).
+        Files under MULTIPART_THRESHOLD are sent in a single multipart request;
+        larger ones use a resumable session sent in chunks.
+        Uploads run in worker threads, so each uses its own thread's service.
+        """
+        from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
+        
+        resumable = file_size >= MULTIPART_THRESHOLD
+        if spool:
+            if resumable:
+                # Chunks are zero-copy slices of the download's memory map
+                source = spool.reader()
+            else:
+                # The multipart body is built by the email package, which needs real bytes
+                view = spool.view(0, file_size)
+                source = io.BytesIO(bytes(view))
+                view.release()
+            media = MediaIoBaseUpload(
+                source,
+                mimetype='video/mp4',
+                resumable=resumable,
+                chunksize=1024*1024
+            )
+        else:
+            # Use MediaFileUpload - this streams directly from disk without loading into RAM
+            media = MediaFileUpload(
+                file_path,
+                mimetype='video/mp4',
+                resumable=resumable,
+                chunksize=1024*1024  # 1MB chunks - keeps memory usage minimal
+            )
+        
+        file_metadata = {
+            'name': final_filename,
+            'parents': [folder_id or self.folder_id]
+        }
+        
+        request = drive_sessions.service().files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id, md5Checksum'
+        )
+        
+        start_time = time.time()
+        if not resumable:
+            upload_shaper.throttle(file_size)
+            with tracer.span('upload_chunk', bytes=file_size, strategy='multipart'):
+                response = request.execute()
+            speed = (file_size / max(1e-6, time.time() - start_time)) / 1024 / 1024
+            transfer_logger.info("⬆️ Upload progress", extra={'file': final_filename, 'percent': 100,
+                                                              'mb_s': round(speed, 2), 'strategy': 'multipart'})
+            if self.progress_callback:
+                self.progress_callback('uploading', final_filename, 100, file_size, file_size, speed)
+            return response
+        
+        response = None
+        log_progress = RateLimitedLog(transfer_logger)
+        
+        uploaded = 0
+        while response is None:
+            if keep_going and not keep_going():
+                # The unfinished resumable session creates no file, so there is nothing to clean up
+                raise TransferAborted(f"Upload of {final_filename} withdrawn at {uploaded} bytes")
+            with tracer.span('upload_chunk') as span:
+                status, response = request.next_chunk()
+                sent = status.resumable_progress if status else file_size
+                span.set(bytes=sent - uploaded)
+            # Pace to the upload limit; waits are sliced so the pace stays smooth
+            upload_shaper.throttle(sent - uploaded)
+            uploaded = sent
+            if status:
+                progress = int(status.progress() * 100)
+                elapsed = max(1e-6, time.time() - start_time)
+                speed = (status.resumable_progress / elapsed) / 1024 / 1024  # MB/s
+                
+                log_progress("⬆️ Upload progress", force=progress >= 100,
+                             extra={'file': final_filename, 'percent': progress, 'mb_s': round(speed, 2)})
+                
+                if self.progress_callback:
+                    self.progress_callback('uploading', final_filename, progress, file_size, status.resumable_progress, speed)
+        
+        return response
+
+    def _delete_quietly(self, file_id):
+        """Remove a corrupt upload (or a folder that lost a creation race) so no bad copy is left behind"""
+        from googleapiclient.errors import HttpError
+        
+        if not file_id:
+            return
+        try:
+            drive_sessions.service().files().delete(fileId=file_id).execute()
+            self.index.remove(file_id)
+        except HttpError as e:
+            print(f"⚠️ Could not delete {file_id}: {e}")
+
+    def _get_unique_filename(self, filename, folder_id=None):
+        """Generate unique filename if file exists (checked against the folder index, no listing)"""
+        folder_id = folder_id or self.folder_id
+        if self.index.is_tracked(folder_id):
+            self.sync_index()
+            existing = self.index.names_in(folder_id)
+            if filename not in existing:
+                return filename
+            name, ext = os.path.splitext(filename)
+            counter = 1
+            while f"{name} ({counter}){ext}" in existing:
+                counter += 1
+            return f"{name} ({counter}){ext}"
+        
         try:
-            query = f"name='{filename}' and parents in '{self.folder_id}' and trashed=false"
-            results = self.service.files().list(q=query).execute()
+            query = f"name='{filename}' and parents in '{folder_id}' and trashed=false"
+            results = drive_sessions.service().files().list(q=query).execute()
             
             if not results.get('files'):
                 return filename
@@ -171,8 +611,8 @@ class DriveUploader:
             
             while True:
                 new_filename = f"{name} ({counter}){ext}"
-                query = f"name='{new_filename}' and parents in '{self.folder_id}' and trashed=false"
-                results = self.service.files().list(q=query).execute()
+                query = f"name='{new_filename}' and parents in '{folder_id}' and trashed=false"
+                results = drive_sessions.service().files().list(q=query).execute()
                 
                 if not results.get('files'):
                     return new_filename
@@ -190,11 +630,181 @@ class DriveUploader:
         """List all uploaded files"""
         return list(self.uploaded.keys())
 
-    def get_upload_stats(self):
-        """Get detailed upload statistics"""
-        total_size = sum(file_info.get('file_size', 0) for file_info in self.uploaded.values())
-        return {
-            'total_files': len(self.uploaded),
-            'total_size_mb': total_size / 1024 / 1024,
-            'files': self.uploaded
-        }
+    def get_upload_stats(self, include_files=False, recent=5):
+        """
+        Get upload statistics from the running counters (O(1)).
+        The full per-file dict is only included on request; use list_uploads to page through it.
+        """
+        with self._lock:
+            stats = {
+                'total_files': len(self.uploaded),
+                'total_size_mb': self._total_size / 1024 / 1024,
+                'recently_uploaded': [name for _, name in self._by_date[-recent:]][::-1] if recent else [],
+                'last_modified': self._tracker_mtime
+            }
+            if include_files:
+                stats['files'] = dict(self.uploaded)
+        return stats
+
+    def list_uploads(self, cursor=None, limit=50, since=None, until=None,
+                     min_size=None, max_size=None, channel=None):
+        """
+        Page through uploads newest first.
+        cursor is the next_cursor of the previous page; since/until are epoch seconds,
+        sizes are bytes. Cost is proportional to the entries scanned, not the tracker size.
+        """
+        limit = max(1, min(limit, LIST_PAGE_MAX))
+        items = []
+        next_cursor = None
+        
+        with self._lock:
+            position = len(self._by_date)
+            if cursor:
+                position = bisect.bisect_left(self._by_date, decode_cursor(cursor))
+            if until is not None:
+                position = min(position, bisect.bisect_right(self._by_date, (until, chr(0x10FFFF))))
+            
+            for index in range(position - 1, -1, -1):
+                uploaded_at, name = self._by_date[index]
+                if since is not None and uploaded_at < since:
+                    break
+                info = self.uploaded[name]
+                size = entry_size(info)
+                if min_size is not None and size < min_size:
+                    continue
+                if max_size is not None and size > max_size:
+                    continue
+                if channel is not None and info.get('channel') != channel:
+                    continue
+                
+                if len(items) == limit:
+                    next_cursor = encode_cursor(self._by_date[index + 1])
+                    break
+                items.append({
+                    'filename': name,
+                    'drive_id': info.get('drive_id'),
+                    'drive_name': info.get('drive_name', name),
+                    'size': size,
+                    'uploaded_at': uploaded_at,
+                    'channel': info.get('channel'),
+                    'md5': entry_md5(info),
+                    'duration': info.get('duration')
+                })
+        
+        return {'items': items, 'next_cursor': next_cursor}
+
+
+class DriveSessionRegistry:
+    """
+    Process-wide Drive session shared by transfer workers and request handlers.
+    Credentials are loaded once and refreshed on a background thread ahead of
+    expiry, so no transfer or request waits on a token refresh. Each thread
+    gets its own service object (httplib2 is not thread-safe) built on the
+    shared credentials, and all callers share one tracker-backed uploader.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._creds = None
+        self._uploader = None
+        self._refresher = None
+
+    def credentials(self):
+        """Authenticated credentials, loading them (and starting the refresher) on first use"""
+        with self._lock:
+            if self._creds is None:
+                self._creds = self._load_credentials()
+                self._refresher = threading.Thread(target=self._refresh_loop, name='drive-token-refresh', daemon=True)
+                self._refresher.start()
+            return self._creds
+
+    def service(self):
+        """This thread's Drive service, built once on the shared credentials"""
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            from googleapiclient.discovery import build, build_from_document
+            
+            creds = self.credentials()
+            # No discovery fetch and no re-parse of the document on later builds
+            discovery_doc = get_discovery_doc()
+            if discovery_doc:
+                service = build_from_document(discovery_doc, credentials=creds)
+            else:
+                service = build('drive', 'v3', credentials=creds)
+            self._local.service = service
+        return service
+
+    def uploader(self):
+        """Shared DriveUploader; the tracker is read once and reloaded only when it changes on disk"""
+        with self._lock:
+            if self._uploader is None:
+                self._uploader = DriveUploader()
+        self._uploader.refresh_tracker()
+        return self._uploader
+
+    def _load_credentials(self):
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from google.auth.transport.requests import Request
+        
+        creds = None
+        
+        if os.path.exists(TOKEN_FILE):
+            try:
+                creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+            except Exception as e:
+                print(f"❌ Error loading token: {e}")
+                if os.path.exists(TOKEN_FILE):
+                    os.remove(TOKEN_FILE)
+                creds = None
+        
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                try:
+                    creds.refresh(Request())
+                except Exception as e:
+                    print(f"❌ Error refreshing token: {e}")
+                    creds = None
+            
+            if not creds:
+                if not os.path.exists('credentials.json'):
+                    raise FileNotFoundError("❌ credentials.json not found")
+                flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
+                creds = flow.run_local_server(port=0)
+            
+            self._save_token(creds)
+        
+        return creds
+
+    def _save_token(self, creds):
+        with open(TOKEN_FILE, 'w') as token:
+            token.write(creds.to_json())
+
+    def _refresh_loop(self):
+        """Refresh the shared token TOKEN_REFRESH_MARGIN seconds before it expires"""
+        from google.auth.transport.requests import Request
+        
+        while True:
+            creds = self._creds
+            if creds.expiry:
+                # google-auth keeps expiry as a naive UTC datetime
+                remaining = (creds.expiry - datetime.utcnow()).total_seconds()
+                delay = max(0, remaining - TOKEN_REFRESH_MARGIN)
+            else:
+                delay = TOKEN_REFRESH_RETRY
+            time.sleep(delay)
+            
+            if not creds.refresh_token:
+                print("⚠️ Drive token has no refresh token, background refresh disabled")
+                return
+            try:
+                creds.refresh(Request())
+                self._save_token(creds)
+                print("🔑 Drive token refreshed in background")
+            except Exception as e:
+                print(f"⚠️ Background token refresh failed: {e}")
+                time.sleep(TOKEN_REFRESH_RETRY)
+
+
+drive_sessions = DriveSessionRegistry()
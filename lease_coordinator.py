@@ -0,0 +1,248 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+LEASE_DB = 'transfer_leases.db'
+LEASE_REDIS_URL = os.environ.get('LEASE_REDIS_URL')  # e.g. redis://queue-host:6379/0 to share leases across nodes
+LEASE_REDIS_PREFIX = 'teletodrive:lease:'
+LEASE_TTL = 120  # Seconds a claim survives without a heartbeat
+HEARTBEAT_INTERVAL = 30
+
+
+def default_worker_id():
+    """Identify this worker process in the lease store"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def lease_key(chat, message):
+    """Build the lease key for one channel message (message id + document id)"""
+    document = getattr(message.media, 'document', None)
+    doc_id = getattr(document, 'id', 0) if document else 0
+    return f"{chat}:{message.id}:{doc_id}"
+
+
+class LeaseCoordinator:
+    """
+    Hands out per-file leases from a shared SQLite store so several worker
+    processes on one host can split one channel. A lease that is not
+    heartbeated within the TTL expires and can be claimed by another worker;
+    completed files are never handed out again.
+
+    SQLite's WAL mode relies on shared memory and file locking that network
+    filesystems do not provide, so this store covers one host; workers on
+    several nodes share a RedisLeaseCoordinator instead (LEASE_REDIS_URL).
+    """
+
+    def __init__(self, db_path=LEASE_DB, worker_id=None, ttl=LEASE_TTL):
+        self.db_path = db_path
+        self.worker_id = worker_id or default_worker_id()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS leases (
+                lease_key TEXT PRIMARY KEY,
+                owner TEXT,
+                state TEXT NOT NULL DEFAULT 'leased',
+                expires_at REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL DEFAULT 0
+            )
+        ''')
+
+    def _transaction(self, fn):
+        """Run fn(conn) inside an immediate (write-locked) transaction"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = fn(self._conn)
+                self._conn.execute('COMMIT')
+                return result
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def claim(self, key):
+        """Claim a file for this worker; returns True only if the lease is now ours"""
+        def _claim(conn):
+            now = time.time()
+            row = conn.execute(
+                'SELECT owner, state, expires_at FROM leases WHERE lease_key = ?', (key,)
+            ).fetchone()
+            if row:
+                owner, state, expires_at = row
+                if state == 'done':
+                    return False
+                if state == 'leased' and owner != self.worker_id and expires_at > now:
+                    return False
+                conn.execute(
+                    'UPDATE leases SET owner = ?, state = ?, expires_at = ?, attempts = attempts + 1, updated_at = ? '
+                    'WHERE lease_key = ?',
+                    (self.worker_id, 'leased', now + self.ttl, now, key)
+                )
+            else:
+                conn.execute(
+                    'INSERT INTO leases (lease_key, owner, state, expires_at, attempts, updated_at) '
+                    'VALUES (?, ?, ?, ?, 1, ?)',
+                    (key, self.worker_id, 'leased', now + self.ttl, now)
+                )
+            return True
+
+        return self._transaction(_claim)
+
+    def heartbeat(self, key):
+        """Extend our lease; returns False if it expired and was taken over"""
+        def _heartbeat(conn):
+            now = time.time()
+            cursor = conn.execute(
+                'UPDATE leases SET expires_at = ?, updated_at = ? '
+                'WHERE lease_key = ? AND owner = ? AND state = ?',
+                (now + self.ttl, now, key, self.worker_id, 'leased')
+            )
+            return cursor.rowcount == 1
+
+        return self._transaction(_heartbeat)
+
+    def complete(self, key):
+        """Mark the file as transferred so no worker picks it up again"""
+        def _complete(conn):
+            cursor = conn.execute(
+                'UPDATE leases SET state = ?, expires_at = 0, updated_at = ? '
+                'WHERE lease_key = ? AND owner = ?',
+                ('done', time.time(), key, self.worker_id)
+            )
+            return cursor.rowcount == 1
+
+        return self._transaction(_complete)
+
+    def release(self, key):
+        """Give the file back immediately (e.g. after a failed transfer)"""
+        def _release(conn):
+            cursor = conn.execute(
+                'UPDATE leases SET state = ?, owner = NULL, expires_at = 0, updated_at = ? '
+                'WHERE lease_key = ? AND owner = ? AND state = ?',
+                ('released', time.time(), key, self.worker_id, 'leased')
+            )
+            return cursor.rowcount == 1
+
+        return self._transaction(_release)
+
+    def get_stats(self):
+        """Count leases by state (expired leases are reported separately)"""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT state, expires_at < ? AS expired, COUNT(*) FROM leases GROUP BY state, expired',
+                (now,)
+            ).fetchall()
+        stats = {'leased': 0, 'expired': 0, 'released': 0, 'done': 0}
+        for state, expired, count in rows:
+            if state == 'leased' and expired:
+                stats['expired'] += count
+            else:
+                stats[state] = stats.get(state, 0) + count
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Each script reads and updates one lease hash atomically on the server, with
+# the server's clock, so nodes with skewed clocks still agree on expiry
+_REDIS_NOW = "local t = redis.call('TIME') local now = tonumber(t[1]) + tonumber(t[2]) / 1000000 "
+_REDIS_CLAIM = _REDIS_NOW + """
+local lease = redis.call('HMGET', KEYS[1], 'owner', 'state', 'expires_at')
+if lease[2] == 'done' then return 0 end
+if lease[2] == 'leased' and lease[1] ~= ARGV[1] and tonumber(lease[3]) > now then return 0 end
+redis.call('HSET', KEYS[1], 'owner', ARGV[1], 'state', 'leased', 'expires_at', now + tonumber(ARGV[2]), 'updated_at', now)
+redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+return 1
+"""
+_REDIS_HEARTBEAT = _REDIS_NOW + """
+local lease = redis.call('HMGET', KEYS[1], 'owner', 'state')
+if lease[1] ~= ARGV[1] or lease[2] ~= 'leased' then return 0 end
+redis.call('HSET', KEYS[1], 'expires_at', now + tonumber(ARGV[2]), 'updated_at', now)
+return 1
+"""
+_REDIS_COMPLETE = _REDIS_NOW + """
+if redis.call('HGET', KEYS[1], 'owner') ~= ARGV[1] then return 0 end
+redis.call('HSET', KEYS[1], 'state', 'done', 'expires_at', 0, 'updated_at', now)
+return 1
+"""
+_REDIS_RELEASE = _REDIS_NOW + """
+local lease = redis.call('HMGET', KEYS[1], 'owner', 'state')
+if lease[1] ~= ARGV[1] or lease[2] ~= 'leased' then return 0 end
+redis.call('HDEL', KEYS[1], 'owner')
+redis.call('HSET', KEYS[1], 'state', 'released', 'expires_at', 0, 'updated_at', now)
+return 1
+"""
+
+
+class RedisLeaseCoordinator:
+    """
+    The same leases kept in Redis, one hash per file, so workers on any
+    number of nodes can split a channel. Only the lease store is shared:
+    each node keeps its own tracker and folder index. The folder index
+    follows Drive's Changes feed, and a done lease stops a node from
+    re-uploading a file another node finished, so the local tracker only
+    lacks other nodes' entries (`run.py --reconcile` imports them).
+    """
+
+    def __init__(self, url=LEASE_REDIS_URL, worker_id=None, ttl=LEASE_TTL, prefix=LEASE_REDIS_PREFIX):
+        import redis
+        self.url = url
+        self.worker_id = worker_id or default_worker_id()
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._claim = self._redis.register_script(_REDIS_CLAIM)
+        self._heartbeat = self._redis.register_script(_REDIS_HEARTBEAT)
+        self._complete = self._redis.register_script(_REDIS_COMPLETE)
+        self._release = self._redis.register_script(_REDIS_RELEASE)
+
+    def claim(self, key):
+        """Claim a file for this worker; returns True only if the lease is now ours"""
+        return self._claim(keys=[self.prefix + key], args=[self.worker_id, self.ttl]) == 1
+
+    def heartbeat(self, key):
+        """Extend our lease; returns False if it expired and was taken over"""
+        return self._heartbeat(keys=[self.prefix + key], args=[self.worker_id, self.ttl]) == 1
+
+    def complete(self, key):
+        """Mark the file as transferred so no worker picks it up again"""
+        return self._complete(keys=[self.prefix + key], args=[self.worker_id]) == 1
+
+    def release(self, key):
+        """Give the file back immediately (e.g. after a failed transfer)"""
+        return self._release(keys=[self.prefix + key], args=[self.worker_id]) == 1
+
+    def get_stats(self):
+        """Count leases by state (expired leases are reported separately)"""
+        seconds, micros = self._redis.time()
+        now = seconds + micros / 1e6
+        stats = {'leased': 0, 'expired': 0, 'released': 0, 'done': 0}
+        keys = list(self._redis.scan_iter(match=f"{self.prefix}*", count=1000))
+        for i in range(0, len(keys), 1000):
+            pipe = self._redis.pipeline(transaction=False)
+            for name in keys[i:i + 1000]:
+                pipe.hmget(name, 'state', 'expires_at')
+            for state, expires_at in pipe.execute():
+                if state == 'leased' and float(expires_at or 0) < now:
+                    stats['expired'] += 1
+                elif state:
+                    stats[state] = stats.get(state, 0) + 1
+        return stats
+
+    def close(self):
+        self._redis.close()
+
+
+def open_coordinator(worker_id=None):
+    """The shared Redis store when LEASE_REDIS_URL is set, else the local SQLite one"""
+    if LEASE_REDIS_URL:
+        return RedisLeaseCoordinator(worker_id=worker_id)
+    return LeaseCoordinator(worker_id=worker_id)
@@ -0,0 +1,118 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+LOG_LEVEL = 'INFO'
+LOG_JSON = True  # One JSON object per line; False for plain text
+LOGGER_LEVELS = {
+    'teletodrive.requests': 'INFO',
+    'teletodrive.transfer': 'INFO',
+    'telethon': 'WARNING',
+    'googleapiclient': 'WARNING',
+    'werkzeug': 'WARNING',
+}
+REQUEST_LOG_SAMPLE_RATE = 20  # Log 1 in N requests per (method, path); warnings always pass
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+_listener = None
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Render records as single-line JSON, including any `extra` fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Pass 1 in `rate` INFO/DEBUG records per key; the passed record carries the skipped count"""
+
+    def __init__(self, rate, key=lambda record: record.getMessage()):
+        super().__init__()
+        self.rate = max(1, rate)
+        self.key = key
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate == 1:
+            return True
+        key = self.key(record)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % self.rate:
+            return False
+        record.sampled = f"1/{self.rate}"
+        return True
+
+
+def request_sample_key(record):
+    return (getattr(record, 'method', None), getattr(record, 'path', None))
+
+
+def setup_logging(level=LOG_LEVEL, levels=None, json_output=LOG_JSON, stream=None):
+    """
+    Route all logging through a queue so emitting a record never does I/O on
+    the calling (request or transfer) thread; a background listener writes it.
+    Safe to call more than once.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter() if json_output else
+                            logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        root.setLevel(level)
+
+        for name, logger_level in (levels or LOGGER_LEVELS).items():
+            logging.getLogger(name).setLevel(logger_level)
+
+        request_logger = logging.getLogger('teletodrive.requests')
+        if not any(isinstance(f, SamplingFilter) for f in request_logger.filters):
+            request_logger.addFilter(SamplingFilter(REQUEST_LOG_SAMPLE_RATE, request_sample_key))
+
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _listener
+
+
+class RateLimitedLog:
+    """Emit at most one progress record per `interval` seconds (hot loops call it per chunk)"""
+
+    def __init__(self, logger, interval=2.0):
+        self.logger = logger
+        self.interval = interval
+        self._last = 0.0
+
+    def __call__(self, msg, *args, force=False, **kwargs):
+        now = time.monotonic()
+        if force or now - self._last >= self.interval:
+            self._last = now
+            self.logger.info(msg, *args, **kwargs)
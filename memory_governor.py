@@ -0,0 +1,128 @@
+import asyncio
+import gc
+import os
+import time
+import tracemalloc
+
+from tracing import tracer
+
+MEMORY_BUDGET_MB = 400  # Anonymous RSS above which new transfers wait (512 MB instances)
+MEMORY_RESUME_RATIO = 0.85  # Admit transfers again once usage drops below budget * ratio
+MEMORY_SAMPLE_INTERVAL = 5.0  # Seconds between background samples
+MEMORY_GC_MIN_INTERVAL = 30.0  # Never force collections closer together than this
+MEMORY_WAIT_MAX = 300.0  # Admit anyway after waiting this long, so a stuck heap can't stall the queue
+MEMORY_TRACEMALLOC_FRAMES = 1  # 0 disables tracemalloc; 1 frame keeps its overhead low
+MEMORY_TOP_N = 5  # Top allocation sites published with each snapshot
+MEMORY_TOP_INTERVAL = 60.0  # Seconds between tracemalloc snapshots (MEMORY_GC_MIN_INTERVAL while over budget)
+
+
+def read_rss_mb():
+    """
+    Anonymous resident memory (heap, stacks) in MB. Spool files are mmapped,
+    so their file-backed pages are excluded: they can be dropped by the kernel
+    and don't count against the budget.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+class MemoryGovernor:
+    """
+    Samples RSS and tracemalloc's top allocation sites, publishes them for the
+    progress endpoints and holds back new transfers while usage is over budget.
+    A full collection runs only when a sample is over budget, at most once per
+    MEMORY_GC_MIN_INTERVAL, instead of after every file.
+    """
+
+    def __init__(self, budget_mb=MEMORY_BUDGET_MB, on_sample=None):
+        self.budget_mb = budget_mb
+        self.on_sample = on_sample
+        self.usage = {'rss_mb': 0.0, 'budget_mb': budget_mb, 'over_budget': False,
+                      'traced_mb': None, 'top_allocations': [], 'collections': 0,
+                      'freed_mb': 0.0, 'waits': 0}
+        self._last_gc = 0.0
+        self._last_top = 0.0
+        self._task = None
+
+    def start(self):
+        """Start tracemalloc and the background sampler on the running loop"""
+        if MEMORY_TRACEMALLOC_FRAMES and not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_TRACEMALLOC_FRAMES)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._sample_loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    async def _sample_loop(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(MEMORY_SAMPLE_INTERVAL)
+
+    def _top_allocations(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        top = []
+        for stat in snapshot.statistics('lineno')[:MEMORY_TOP_N]:
+            frame = stat.traceback[0]
+            top.append({'where': f"{os.path.basename(frame.filename)}:{frame.lineno}",
+                        'size_kb': round(stat.size / 1024, 1), 'count': stat.count})
+        return top
+
+    def sample(self):
+        """Measure now; collect if over budget and a collection is due. Returns the usage dict"""
+        rss = read_rss_mb()
+        now = time.monotonic()
+        over = rss >= self.budget_mb
+        if over and now - self._last_gc >= MEMORY_GC_MIN_INTERVAL:
+            self._last_gc = now
+            with tracer.span('gc', rss_mb=round(rss, 1)):
+                gc.collect()
+            after = read_rss_mb()
+            self.usage['collections'] += 1
+            self.usage['freed_mb'] = round(max(0.0, rss - after), 1)
+            print(f"🧹 Memory over budget ({rss:.0f}/{self.budget_mb} MB), collected: now {after:.0f} MB")
+            rss = after
+            over = rss >= self.budget_mb
+
+        if tracemalloc.is_tracing():
+            self.usage['traced_mb'] = round(tracemalloc.get_traced_memory()[0] / 1024 / 1024, 1)
+            # Snapshots walk every traced block on the loop, so they stay rate-limited even over budget
+            interval = MEMORY_GC_MIN_INTERVAL if over else MEMORY_TOP_INTERVAL
+            if now - self._last_top >= interval:
+                self._last_top = now
+                self.usage['top_allocations'] = self._top_allocations()
+
+        self.usage.update({'rss_mb': round(rss, 1), 'over_budget': over})
+        if self.on_sample:
+            self.on_sample(self.usage)
+        return self.usage
+
+    async def wait_for_budget(self):
+        """Backpressure for the transfer queue: wait while usage is over budget"""
+        if not self.sample()['over_budget']:
+            return
+        resume_at = self.budget_mb * MEMORY_RESUME_RATIO
+        self.usage['waits'] += 1
+        print(f"⏳ Memory at {self.usage['rss_mb']:.0f}/{self.budget_mb} MB, holding new transfers...")
+        deadline = time.monotonic() + MEMORY_WAIT_MAX
+        while time.monotonic() < deadline:
+            await asyncio.sleep(MEMORY_SAMPLE_INTERVAL)
+            if self.sample()['rss_mb'] < resume_at:
+                print(f"▶️ Memory back to {self.usage['rss_mb']:.0f} MB, resuming")
+                return
+        print(f"⚠️ Memory still at {self.usage['rss_mb']:.0f} MB after {MEMORY_WAIT_MAX:.0f}s, continuing anyway")
@@ -0,0 +1,175 @@
+import sqlite3
+import threading
+import time
+
+METADATA_DB = 'telegram_metadata.db'
+
+
+def entity_key(session, chat):
+    """Cache key for a resolved chat; access hashes are per account, so the session is part of it"""
+    return f"{session}:{str(chat).lstrip('@').lower()}"
+
+
+class MetadataCache:
+    """
+    Local SQLite store of resolved input entities (id + access_hash) and
+    compact per-video message records, so repeated runs skip ResolveUsername
+    and planning and stats don't need Telegram round trips. A per-chat scan
+    watermark records how far the last completed scan searched.
+    Records carry the message's edit_date; an edit or delete seen later
+    replaces or removes the record.
+    """
+
+    def __init__(self, db_path=METADATA_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        """Open the store on first use, so importing this module touches no files"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS entities (
+                    entity_key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    entity_id INTEGER NOT NULL,
+                    access_hash INTEGER,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS messages (
+                    chat TEXT NOT NULL,
+                    message_id INTEGER NOT NULL,
+                    date REAL,
+                    edit_date REAL,
+                    doc_id INTEGER,
+                    size INTEGER,
+                    mime TEXT,
+                    title TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (chat, message_id)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS scan_watermarks (
+                    chat TEXT PRIMARY KEY,
+                    message_id INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            self._conn = conn
+        return self._conn
+
+    # Entities
+
+    def get_input_peer(self, session, chat):
+        """Rebuild a cached InputPeer for chat, or None if it was never resolved"""
+        with self._lock:
+            row = self._db().execute(
+                'SELECT kind, entity_id, access_hash FROM entities WHERE entity_key = ?',
+                (entity_key(session, chat),)
+            ).fetchone()
+        if not row:
+            return None
+        from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerUser
+        kind, entity_id, access_hash = row
+        if kind == 'channel':
+            return InputPeerChannel(entity_id, access_hash)
+        if kind == 'user':
+            return InputPeerUser(entity_id, access_hash)
+        return InputPeerChat(entity_id)
+
+    def put_input_peer(self, session, chat, peer):
+        from telethon.tl.types import InputPeerChannel, InputPeerUser
+        if isinstance(peer, InputPeerChannel):
+            kind, entity_id, access_hash = 'channel', peer.channel_id, peer.access_hash
+        elif isinstance(peer, InputPeerUser):
+            kind, entity_id, access_hash = 'user', peer.user_id, peer.access_hash
+        elif hasattr(peer, 'chat_id'):
+            kind, entity_id, access_hash = 'chat', peer.chat_id, None
+        else:
+            return
+        with self._lock:
+            self._db().execute(
+                'INSERT OR REPLACE INTO entities (entity_key, kind, entity_id, access_hash, updated_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (entity_key(session, chat), kind, entity_id, access_hash, time.time())
+            )
+
+    def forget_input_peer(self, session, chat):
+        """Drop a cached entity (e.g. after ChannelInvalidError) so the next use resolves it again"""
+        with self._lock:
+            self._db().execute('DELETE FROM entities WHERE entity_key = ?', (entity_key(session, chat),))
+
+    # Messages
+
+    def record_messages(self, chat, records):
+        """Upsert message records (dicts from message_record); a newer edit replaces the old title/size"""
+        now = time.time()
+        with self._lock:
+            self._db().executemany(
+                'INSERT OR REPLACE INTO messages '
+                '(chat, message_id, date, edit_date, doc_id, size, mime, title, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(chat, r['id'], r['date'], r['edit_date'], r['doc_id'], r['size'], r['mime'], r['title'], now)
+                 for r in records]
+            )
+
+    def forget_messages(self, chat, message_ids):
+        with self._lock:
+            self._db().executemany(
+                'DELETE FROM messages WHERE chat = ? AND message_id = ?',
+                [(chat, message_id) for message_id in message_ids]
+            )
+
+    def scan_watermark(self, chat):
+        """Newest message id a completed scan of chat searched up to (0 if never scanned)"""
+        with self._lock:
+            row = self._db().execute('SELECT message_id FROM scan_watermarks WHERE chat = ?', (chat,)).fetchone()
+        return row[0] if row else 0
+
+    def set_scan_watermark(self, chat, message_id):
+        """Only a finished scan calls this; live monitor records don't move it, so gaps get searched"""
+        with self._lock:
+            self._db().execute(
+                'INSERT INTO scan_watermarks (chat, message_id, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(chat) DO UPDATE SET message_id = MAX(message_id, excluded.message_id), '
+                'updated_at = excluded.updated_at',
+                (chat, message_id, time.time())
+            )
+
+    def get_messages(self, chat):
+        """Cached video records for chat, newest first"""
+        with self._lock:
+            rows = self._db().execute(
+                'SELECT message_id, date, edit_date, doc_id, size, mime, title FROM messages '
+                'WHERE chat = ? ORDER BY message_id DESC',
+                (chat,)
+            ).fetchall()
+        return [{'id': r[0], 'date': r[1], 'edit_date': r[2], 'doc_id': r[3],
+                 'size': r[4], 'mime': r[5], 'title': r[6]} for r in rows]
+
+    def get_stats(self):
+        """Per-chat video counts and sizes straight from the cache"""
+        with self._lock:
+            rows = self._db().execute(
+                'SELECT chat, COUNT(*), COALESCE(SUM(size), 0), MAX(message_id) FROM messages GROUP BY chat'
+            ).fetchall()
+            entities = self._db().execute('SELECT COUNT(*) FROM entities').fetchone()[0]
+        return {
+            'entities': entities,
+            'chats': {chat: {'videos': count, 'total_size_mb': round(size / 1024 / 1024, 2), 'max_message_id': max_id}
+                      for chat, count, size, max_id in rows}
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+metadata_cache = MetadataCache()
@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_INTERVAL = 0.005  # Seconds between stack samples (~200 Hz)
+PROFILE_MAX_SECONDS = 120  # Longest single profile the endpoint/CLI will take
+PROFILE_DIR = 'profiles'
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')  # Required by /debug/profile when set; else loopback only
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for the running process: a background thread
+    snapshots every thread's stack with sys._current_frames() and counts
+    identical stacks. Nothing runs between profiles, so it can stay enabled.
+    Output is collapsed-stack text ("thread;outer;...;inner count") for
+    flamegraph.pl, speedscope or inferno.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._busy = False
+        self._stop = threading.Event()
+
+    @property
+    def busy(self):
+        return self._busy
+
+    def sample(self, seconds, exclude=()):
+        """Sample all threads (except the caller and `exclude` idents) for `seconds`; returns (Counter, samples)"""
+        seconds = min(max(seconds, self.interval), PROFILE_MAX_SECONDS)
+        with self._lock:
+            if self._busy:
+                raise RuntimeError("A profile is already being taken")
+            self._busy = True
+            self._stop.clear()
+        try:
+            skip = {threading.get_ident(), *exclude}
+            stacks = Counter()
+            samples = 0
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline and not self._stop.is_set():
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident in skip:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame))
+                        frame = frame.f_back
+                    stack.append(names.get(ident, f"thread-{ident}"))
+                    stacks[';'.join(reversed(stack))] += 1
+                frame = None
+                samples += 1
+                self._stop.wait(self.interval)
+            return stacks, samples
+        finally:
+            self._busy = False
+
+    def stop(self):
+        """End the profile in progress early; what was sampled so far is kept"""
+        self._stop.set()
+
+    @staticmethod
+    def collapse(stacks):
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def profile(self, seconds, exclude=()):
+        """Take a profile and return it as collapsed-stack text"""
+        stacks, _ = self.sample(seconds, exclude)
+        return self.collapse(stacks)
+
+    def profile_to_file(self, seconds, path=None):
+        """Take a profile and write it under PROFILE_DIR; returns the path"""
+        stacks, samples = self.sample(seconds)
+        if path is None:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(path, 'w') as f:
+            f.write(self.collapse(stacks))
+        print(f"🔥 Profile written: {path} ({samples} samples, {len(stacks)} unique stacks)")
+        return path
+
+    def start_background(self, seconds, path=None):
+        """Profile the rest of the process from a daemon thread (run.py --profile)"""
+        def run():
+            try:
+                self.profile_to_file(seconds, path)
+            except Exception as e:
+                print(f"⚠️ Profiling failed: {e}")
+
+        thread = threading.Thread(target=run, name='sampling-profiler', daemon=True)
+        thread.start()
+        return thread
+
+
+profiler = SamplingProfiler()
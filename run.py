@@ -1,7 +1,9 @@
 import asyncio
 import sys
-from telegram_downloader import main as telegram_main
-from drive_uploader import DriveUploader
+from telegram_downloader import main as telegram_main, monitor as telegram_monitor, reconcile as telegram_reconcile
+from drive_uploader import drive_sessions
+from logging_config import setup_logging
+from profiler import profiler, PROFILE_MAX_SECONDS
 
 
 def check_credentials():
@@ -23,10 +25,20 @@ def check_credentials():
     return True
 
 
+def profile_seconds():
+    """Seconds requested with --profile[=N] (30 by default), or None"""
+    for arg in sys.argv[1:]:
+        if arg == '--profile':
+            return 30
+        if arg.startswith('--profile='):
+            return min(float(arg.split('=', 1)[1]), PROFILE_MAX_SECONDS)
+    return None
+
+
 def show_stats():
     """Show upload statistics"""
-    uploader = DriveUploader()
-    if uploader.load_tracker():
+    uploader = drive_sessions.uploader()
+    if uploader.uploaded:
         print(f"\n📊 Statistics:")
         print(f"   Total uploaded videos: {uploader.get_uploaded_count()}")
     else:
@@ -35,6 +47,7 @@ def show_stats():
 
 async def main():
     """Main function to run the telegram downloader"""
+    setup_logging()
     print("🚀 Starting Telegram to Google Drive Video Uploader")
     print("=" * 50)
     
@@ -42,6 +55,12 @@ async def main():
     if not check_credentials():
         return
     
+    seconds = profile_seconds()
+    profile_thread = None
+    if seconds:
+        print(f"🔥 Sampling profiler on for the first {seconds:g}s (written to profiles/)")
+        profile_thread = profiler.start_background(seconds)
+    
     try:
         # Show current stats
         show_stats()
@@ -49,7 +68,17 @@ async def main():
         print("\n🔄 Starting download and upload process...")
         
         # Run the telegram downloader (which includes drive upload)
-        await telegram_main()
+        if '--monitor' in sys.argv:
+            print("👀 Live monitoring mode (Ctrl+C to stop)")
+            await telegram_monitor()
+        elif '--reconcile' in sys.argv:
+            print("🔁 Reconcile mode: importing existing Drive files into the tracker")
+            await telegram_reconcile()
+        elif '--backfill' in sys.argv:
+            print("📦 Backfill mode: full history through a Telegram takeout session")
+            await telegram_main(backfill=True)
+        else:
+            await telegram_main()
         
         # Show final stats
         print("\n" + "=" * 50)
@@ -62,6 +91,11 @@ async def main():
     except Exception as e:
         print(f"\n❌ Error occurred: {e}")
         sys.exit(1)
+    finally:
+        if profile_thread:
+            # A run shorter than the profile window still writes what was sampled
+            profiler.stop()
+            profile_thread.join()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from concurrency import CONCURRENCY_MAX
+
+POOL_SESSIONS = []  # Extra authorized session files (e.g. 'session2'); the main 'session' is always in the pool
+POOL_FLOOD_SLEEP_THRESHOLD = 5  # Pooled sessions raise flood waits above this instead of sleeping through them
+POOL_MAX_ACTIVE = CONCURRENCY_MAX  # Concurrent downloads per session; the download limiter sets the real parallelism
+
+
+class PooledSession:
+    """One Telegram account in the pool with its live load and flood-wait state"""
+
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+        self.active = 0
+        self.flood_until = 0.0
+        self.downloads = 0
+        self.bytes = 0
+        self.floods = 0
+
+    @property
+    def flooded(self):
+        return time.monotonic() < self.flood_until
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'active': self.active,
+            'downloads': self.downloads,
+            'mb': round(self.bytes / 1024 / 1024, 1),
+            'floods': self.floods,
+            'flood_wait_s': max(0, round(self.flood_until - time.monotonic()))
+        }
+
+
+class SessionPool:
+    """
+    Spreads downloads over several authorized Telegram accounts. Each download
+    goes to the least-loaded session that is not in a flood wait; a session
+    that gets throttled is parked until its wait expires and the download is
+    retried on another one, so throughput grows with the number of accounts.
+    """
+
+    def __init__(self, session_names=POOL_SESSIONS):
+        self.session_names = list(session_names)
+        self.sessions = []
+        self._changed = None
+        self._primary_threshold = None
+
+    async def start(self, primary_client, api_id, api_hash):
+        """Add the main client and connect every extra session that is already authorized"""
+        self._changed = asyncio.Condition()
+        # A flood-waited download on the main account is parked and retried like any other,
+        # instead of sleeping in place while it holds a download slot
+        self._primary_threshold = primary_client.flood_sleep_threshold
+        primary_client.flood_sleep_threshold = POOL_FLOOD_SLEEP_THRESHOLD
+        self.sessions = [PooledSession('session', primary_client)]
+        if self.session_names:
+            from telethon import TelegramClient
+        for name in self.session_names:
+            client = TelegramClient(name, api_id, api_hash)
+            client.flood_sleep_threshold = POOL_FLOOD_SLEEP_THRESHOLD
+            await client.connect()
+            if not await client.is_user_authorized():
+                print(f"⚠️ Session '{name}' is not authorized, leaving it out of the pool")
+                await client.disconnect()
+                continue
+            self.sessions.append(PooledSession(name, client))
+        print(f"👥 Telegram session pool: {', '.join(s.name for s in self.sessions)}")
+
+    async def disconnect(self):
+        """Disconnect the extra sessions (the main client is owned by telegram_downloader)"""
+        for session in self.sessions[1:]:
+            await session.client.disconnect()
+        self.sessions = self.sessions[:1]
+        if self.sessions and self._primary_threshold is not None:
+            self.sessions[0].client.flood_sleep_threshold = self._primary_threshold
+            self._primary_threshold = None
+
+    def _pick(self):
+        ready = [s for s in self.sessions if not s.flooded and s.active < POOL_MAX_ACTIVE]
+        if not ready:
+            return None
+        return min(ready, key=lambda s: (s.active, s.bytes))
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Borrow the best session for one download, waiting while all are busy or throttled"""
+        async with self._changed:
+            while (session := self._pick()) is None:
+                waits = [s.flood_until - time.monotonic() for s in self.sessions if s.flooded]
+                timeout = max(0.1, min(waits)) if waits else None
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            session.active += 1
+        try:
+            yield session
+        finally:
+            async with self._changed:
+                session.active -= 1
+                self._changed.notify_all()
+
+    def report_flood(self, session, seconds):
+        """Park a session until its flood wait is over"""
+        session.flood_until = time.monotonic() + seconds
+        session.floods += 1
+        print(f"🚦 Session '{session.name}' flood-waited for {seconds}s, moving downloads to other sessions")
+
+    def record(self, session, nbytes):
+        session.downloads += 1
+        session.bytes += nbytes
+
+    def get_stats(self):
+        return [session.stats() for session in self.sessions]
+
+
+session_pool = SessionPool()
@@ -0,0 +1,272 @@
+import asyncio
+import errno
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+
+SPOOL_DIR = os.path.join(tempfile.gettempdir(), 'teletodrive_spool')
+SPOOL_QUOTA = 4 * 1024 * 1024 * 1024  # Max bytes reserved by in-flight downloads
+SPOOL_MIN_FREE = 512 * 1024 * 1024  # Always leave this much free on the spool disk
+SPOOL_UNKNOWN_SIZE_RESERVE = 64 * 1024 * 1024  # Reservation when document.size is unknown
+SPOOL_WAIT_INTERVAL = 0.5  # Seconds between admission retries
+SPOOL_PREFIX = 'spool-'
+SPOOL_SUFFIX = '.mp4'
+SPOOL_GROW_STEP = 16 * 1024 * 1024  # Growth when the final size is unknown
+
+
+class SpoolFile:
+    """
+    Download spool preallocated to the document size and written through a
+    shared memory map. Chunks land at their offsets without a write syscall
+    each, and the upload reads the same mapping as zero-copy memoryviews.
+    """
+
+    def __init__(self, path, size=0):
+        self.path = path
+        self.size = size  # Expected size (document.size), 0 if unknown
+        self.length = 0   # Bytes actually written
+        self._pos = 0
+        self._capacity = 0
+        self._map = None
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if size > 0:
+            try:
+                self._allocate(size)
+            except OSError:
+                self.close()
+                raise
+
+    def _allocate(self, capacity):
+        """Reserve disk blocks up front so the file doesn't fragment as it fills"""
+        try:
+            os.posix_fallocate(self._fd, 0, capacity)
+        except AttributeError:
+            # No posix_fallocate on this platform
+            os.ftruncate(self._fd, capacity)
+        except OSError as e:
+            # Only a filesystem without fallocate support may fall back to a sparse file;
+            # ENOSPC must surface here, or the mmap writes would SIGBUS once the disk fills
+            if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                raise
+            os.ftruncate(self._fd, capacity)
+        if self._map is None:
+            self._map = mmap.mmap(self._fd, capacity)
+        else:
+            self._map.resize(capacity)
+        self._capacity = capacity
+
+    def _ensure_capacity(self, end):
+        if end > self._capacity:
+            self._allocate(max(end, self._capacity * 2, SPOOL_GROW_STEP))
+
+    def write_at(self, offset, data):
+        """Copy a chunk into the mapping at its file offset"""
+        end = offset + len(data)
+        self._ensure_capacity(end)
+        self._map[offset:end] = data
+        self.length = max(self.length, end)
+        return len(data)
+
+    def write(self, data):
+        """Sequential write, as used by Telethon's downloader"""
+        written = self.write_at(self._pos, data)
+        self._pos += written
+        return written
+
+    def flush(self):
+        pass
+
+    def rewind(self):
+        """Start writing from the beginning again (a download restarted on another session)"""
+        self._pos = 0
+        self.length = 0
+
+    def view(self, offset, length):
+        """Zero-copy slice of the written data"""
+        end = min(offset + length, self.length)
+        return memoryview(self._map)[offset:max(offset, end)]
+
+    def finalize(self):
+        """Trim preallocated space beyond what was written"""
+        if self._map is not None and self._capacity > self.length:
+            if self.length:
+                self._map.resize(self.length)
+            else:
+                self._map.close()
+                self._map = None
+                os.ftruncate(self._fd, 0)
+            self._capacity = self.length
+
+    def reader(self):
+        """File-like view for MediaIoBaseUpload"""
+        return SpoolReader(self)
+
+    def close(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # An upload chunk still references the mapping; it is freed with it
+                pass
+            self._map = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def discard(self):
+        """Close and delete the spool file"""
+        self.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SpoolReader:
+    """Seekable reader over a SpoolFile that returns memoryview slices instead of copies"""
+
+    def __init__(self, spool):
+        self.spool = spool
+        self._pos = 0
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self.spool.length
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.spool.length - self._pos
+        data = self.spool.view(self._pos, size)
+        self._pos += len(data)
+        return data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+
+class SpoolManager:
+    """
+    Creates download spool files in a dedicated directory under a byte quota.
+    Downloads reserve their expected size before starting and wait while the
+    quota (or the disk's free space) is exhausted. Files left behind by crashed
+    runs are reclaimed at startup.
+    """
+
+    def __init__(self, directory=SPOOL_DIR, quota=SPOOL_QUOTA, min_free=SPOOL_MIN_FREE):
+        self.directory = directory
+        self.quota = quota
+        self.min_free = min_free
+        self.reserved = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def free_space(self):
+        """Bytes available to us on the spool filesystem"""
+        return shutil.disk_usage(self.directory).free
+
+    def _try_reserve(self, nbytes):
+        with self._lock:
+            # Space already reserved but not yet written is still counted as free on disk
+            available = min(self.quota, self.reserved + self.free_space() - self.min_free)
+            if self.reserved + nbytes <= available:
+                self.reserved += nbytes
+                return True
+            if self.reserved == 0:
+                # Nothing in flight will free space for us, so waiting cannot help
+                raise OSError(errno.ENOSPC, f"Spool cannot fit {nbytes / 1024 / 1024:.1f} MB "
+                                            f"(quota {self.quota / 1024 / 1024:.0f} MB, "
+                                            f"free {self.free_space() / 1024 / 1024:.0f} MB)")
+            return False
+
+    def release(self, nbytes):
+        with self._lock:
+            self.reserved = max(0, self.reserved - nbytes)
+
+    async def acquire(self, size=0):
+        """Reserve space for a download (waiting if needed) and create its spool"""
+        nbytes = size if size > 0 else SPOOL_UNKNOWN_SIZE_RESERVE
+        waited = False
+        while not self._try_reserve(nbytes):
+            if not waited:
+                print(f"⏳ Spool full ({self.reserved / 1024 / 1024:.0f} MB reserved), waiting for space...")
+                waited = True
+            await asyncio.sleep(SPOOL_WAIT_INTERVAL)
+        
+        path = None
+        try:
+            fd, path = tempfile.mkstemp(prefix=f"{SPOOL_PREFIX}{os.getpid()}-", suffix=SPOOL_SUFFIX, dir=self.directory)
+            os.close(fd)
+            spool = SpoolFile(path, size)
+        except Exception:
+            if path is not None:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            self.release(nbytes)
+            raise
+        spool.reserved = nbytes
+        return spool
+
+    def dispose(self, spool):
+        """Delete a spool and return its reservation"""
+        try:
+            spool.discard()
+        finally:
+            self.release(getattr(spool, 'reserved', 0))
+            spool.reserved = 0
+
+    def reclaim_orphans(self):
+        """Delete spool files whose owning process is gone; returns bytes reclaimed"""
+        reclaimed = 0
+        for name in os.listdir(self.directory):
+            if not (name.startswith(SPOOL_PREFIX) and name.endswith(SPOOL_SUFFIX)):
+                continue
+            try:
+                pid = int(name[len(SPOOL_PREFIX):].split('-', 1)[0])
+            except ValueError:
+                continue
+            if _pid_alive(pid):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                reclaimed += os.path.getsize(path)
+                os.unlink(path)
+            except OSError:
+                pass
+        if reclaimed:
+            print(f"🧹 Reclaimed {reclaimed / 1024 / 1024:.1f} MB of orphaned spool files")
+        return reclaimed
+
+    def get_stats(self):
+        return {
+            'directory': self.directory,
+            'quota_mb': self.quota / 1024 / 1024,
+            'reserved_mb': self.reserved / 1024 / 1024,
+            'free_mb': self.free_space() / 1024 / 1024
+        }
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+spool_manager = SpoolManager()
@@ -1,19 +1,118 @@
 import asyncio
 import os
 import re
-import tempfile
 import time
-import gc  # For garbage collection
-from telethon import TelegramClient
-from telethon.tl.types import MessageMediaDocument, DocumentAttributeVideo
-from drive_uploader import DriveUploader
+import hashlib
+import logging
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, AsyncExitStack
+from drive_uploader import drive_sessions
+from cpu_stages import cpu_pool, probe_video_metadata
+from spool_manager import spool_manager
+from logging_config import RateLimitedLog
+from tracing import tracer
+from memory_governor import MemoryGovernor
+from session_pool import session_pool
+from metadata_cache import metadata_cache
+from crypto_backend import get_crypto_status
+from concurrency import download_limiter, upload_limiter, CONCURRENCY_MAX
+from bandwidth import download_shaper
+from lease_coordinator import open_coordinator, lease_key, HEARTBEAT_INTERVAL
 
 API_ID = 27395677
 API_HASH = 'b7ee4d7b5b578e5a2ebba4dd0ff84838'
 PHONE_NUMBER = '+918512094758'
 TARGET_CHAT = 'campusxdsmp1_0'
+MONITOR_CHATS = [TARGET_CHAT]  # Chats watched by live monitoring mode
+SCAN_DOCUMENT_VIDEOS = True  # Also scan documents for videos sent as plain files
+INTEGRITY_ALGORITHMS = ('md5',)  # Add 'sha256' for a stronger local digest
+HASH_MAX_PENDING = 8  # Downloaded chunks queued for a writer's hashing thread before the download waits
+TAKEOUT_MAX_FILE_SIZE = 2000 * 1024 * 1024  # Largest file a backfill takeout session may download
 
-client = TelegramClient('session', API_ID, API_HASH)
+# Telethon is imported and the client built on first use, so importing this
+# module (e.g. from app.py for progress state) stays cheap
+_client = None
+_takeout = None  # Takeout session while a backfill runs
+_verified_peers = set()  # (session, chat) whose cached peer Telegram accepted in this process
+
+def get_client():
+    """Return the shared TelegramClient, creating it on first use"""
+    global _client
+    if _client is None:
+        from telethon import TelegramClient
+        _client = TelegramClient('session', API_ID, API_HASH)
+    return _client
+
+def get_transfer_client():
+    """Client for history scans and downloads: the takeout session during a backfill"""
+    return _takeout or get_client()
+
+@asynccontextmanager
+async def transfer_session(backfill=False):
+    """
+    Incremental runs use the regular client. Backfills open a takeout session,
+    which Telegram rate-limits far more leniently for bulk exports, and route
+    history scans and media downloads through it until the run ends.
+    """
+    global _takeout
+    if not backfill:
+        yield get_client()
+        return
+    
+    from telethon import errors
+    try:
+        async with get_client().takeout(
+            finalize=True, channels=True, megagroups=True, files=True,
+            max_file_size=TAKEOUT_MAX_FILE_SIZE
+        ) as takeout:
+            print("📦 Takeout session opened for backfill")
+            _takeout = takeout
+            try:
+                yield takeout
+            finally:
+                _takeout = None
+    except errors.TakeoutInitDelayError as e:
+        print(f"⏳ Telegram delays new takeout sessions by {e.seconds}s; approve the export in Telegram's "
+              f"service notifications or run the backfill again later")
+        raise
+
+async def resolve_chat(chat, client=None, session='session'):
+    """
+    Input peer for chat from the metadata cache; ResolveUsername only runs the first time.
+    A cached peer is checked once per process and resolved again if Telegram
+    rejects its access hash (channel gone private, session re-created for another account).
+    """
+    from telethon import errors
+    client = client or get_transfer_client()
+    peer = metadata_cache.get_input_peer(session, chat)
+    if peer is not None and (session, chat) not in _verified_peers:
+        try:
+            await client.get_entity(peer)
+        except (errors.ChannelInvalidError, errors.ChannelPrivateError, errors.PeerIdInvalidError, ValueError) as e:
+            print(f"♻️ Cached peer for {chat} was rejected ({type(e).__name__}), resolving it again")
+            metadata_cache.forget_input_peer(session, chat)
+            peer = None
+    if peer is None:
+        peer = await client.get_input_entity(chat)
+        metadata_cache.put_input_peer(session, chat, peer)
+    _verified_peers.add((session, chat))
+    return peer
+
+def message_record(message):
+    """Compact metadata record of a video message for the cache"""
+    document = message.media.document
+    return {
+        'id': message.id,
+        'date': message.date.timestamp() if message.date else None,
+        'edit_date': message.edit_date.timestamp() if message.edit_date else None,
+        'doc_id': document.id,
+        'size': document.size,
+        'mime': getattr(document, 'mime_type', None),
+        'title': get_video_title(message)
+    }
+
+transfer_logger = logging.getLogger('teletodrive.transfer')
 
 # Simplified global progress tracking
 current_progress = {
@@ -28,8 +127,10 @@ current_progress = {
 def update_global_progress(operation, file_name=None, progress=0, file_size=0, downloaded_size=0, speed=0):
     """Memory-safe progress tracking"""
     global current_progress
-    # Clear previous data to prevent memory accumulation
+    # Clear previous data to prevent memory accumulation (memory readings are kept)
+    memory = {key: current_progress[key] for key in ('memory_usage', 'memory') if key in current_progress}
     current_progress.clear()
+    current_progress.update(memory)
     current_progress.update({
         'operation': operation,
         'file_name': file_name,
@@ -39,6 +140,13 @@ def update_global_progress(operation, file_name=None, progress=0, file_size=0, d
         'speed': speed
     })
 
+def publish_memory_usage(usage):
+    """Expose the governor's latest sample through current_progress (read by app.py)"""
+    current_progress['memory_usage'] = usage['rss_mb']
+    current_progress['memory'] = dict(usage)
+
+memory_governor = MemoryGovernor(on_sample=publish_memory_usage)
+
 def sanitize_filename(filename):
     """Clean filename for filesystem"""
     filename = re.sub(r'[<>:"/\\|?*]', '', filename)
@@ -72,43 +180,248 @@ def get_file_size(message):
         return message.media.document.size
     return 0
 
-async def process_single_video(message, filename, drive_uploader, file_size):
-    """Process one video with memory-safe approach"""
+def is_video_message(message):
+    """Client-side check for video documents (also catches videos sent as files)"""
+    from telethon.tl.types import MessageMediaDocument, DocumentAttributeVideo
+    if not (message.media and
+            isinstance(message.media, MessageMediaDocument) and
+            message.media.document):
+        return False
+    document = message.media.document
+    for attr in document.attributes or []:
+        if isinstance(attr, DocumentAttributeVideo):
+            return True
+    return (getattr(document, 'mime_type', None) or '').startswith('video/')
+
+async def scan_video_messages(chat, skip=None):
+    """
+    Collect video messages using Telegram's server-side search filters, so
+    text, photos and stickers are never fetched. The document pass catches
+    videos uploaded as plain files, which the video filter does not return.
+    Only messages newer than the last completed scan are searched; cached
+    videos not excluded by skip(record) are re-read by id, which also picks
+    up edits and deletions. Backfills search the whole history.
+    """
+    from telethon.tl.types import InputMessagesFilterVideo, InputMessagesFilterDocument
+    client = get_transfer_client()
+    peer = await resolve_chat(chat, client)
+    # Takeout sessions don't need iter_messages' self-throttling between batches
+    wait_time = 0 if _takeout is not None else None
+    known_max = 0 if _takeout is not None else metadata_cache.scan_watermark(chat)
+    videos = {}
+    fetched = 0
+    # The video pass runs first, so its newest id is the safe point for the next scan
+    searched_to = known_max
+    
+    async for message in client.iter_messages(peer, filter=InputMessagesFilterVideo, min_id=known_max, wait_time=wait_time):
+        fetched += 1
+        searched_to = max(searched_to, message.id)
+        if is_video_message(message):
+            videos[message.id] = message
+    
+    if SCAN_DOCUMENT_VIDEOS:
+        async for message in client.iter_messages(peer, filter=InputMessagesFilterDocument, min_id=known_max, wait_time=wait_time):
+            fetched += 1
+            if message.id not in videos and is_video_message(message):
+                videos[message.id] = message
+    
+    cached = [record for record in metadata_cache.get_messages(chat) if record['id'] not in videos]
+    pending = [record['id'] for record in cached if not (skip and skip(record))]
+    for i in range(0, len(pending), 100):
+        batch = pending[i:i + 100]
+        fetched += len(batch)
+        gone = []
+        for message_id, message in zip(batch, await client.get_messages(peer, ids=batch)):
+            if message is not None and is_video_message(message):
+                videos[message.id] = message
+            else:
+                gone.append(message_id)
+        metadata_cache.forget_messages(chat, gone)
+    metadata_cache.record_messages(chat, [message_record(message) for message in videos.values()])
+    metadata_cache.set_scan_watermark(chat, searched_to)
+    
+    # Newest first, matching iter_messages order
+    video_messages = [videos[message_id] for message_id in sorted(videos, reverse=True)]
+    print(f"📊 Scan cost: {fetched} messages fetched, {len(cached) - len(pending)} settled from cache, "
+          f"{len(video_messages)} videos found")
+    return video_messages
+
+class HashingWriter:
+    """
+    File wrapper that hashes bytes as Telethon writes them, so verification
+    needs no second read. The digests are updated in write order on the
+    writer's own thread (hashlib releases the GIL), keeping them off the event
+    loop; a write only waits when that thread falls HASH_MAX_PENDING chunks behind.
+    """
+    def __init__(self, file, algorithms=INTEGRITY_ALGORITHMS):
+        from concurrent.futures import ThreadPoolExecutor
+        self.file = file
+        self.hashers = {name: hashlib.new(name) for name in algorithms}
+        self.written = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='hash')
+        self._pending = deque()
+
+    def _update(self, data):
+        for hasher in self.hashers.values():
+            hasher.update(data)
+
+    async def write(self, data):
+        # Telethon awaits write() when it returns an awaitable
+        written = self.file.write(data)
+        self.written += len(data)
+        self._pending.append(self._executor.submit(self._update, data))
+        while len(self._pending) > HASH_MAX_PENDING:
+            await asyncio.wrap_future(self._pending.popleft())
+        return written
+
+    def tell(self):
+        # Telethon reports progress as f.tell()
+        return self.written
+
+    def flush(self):
+        self.file.flush()
+
+    async def hexdigests(self):
+        """Wait for the queued chunks, then return the digests"""
+        if self._pending:
+            await asyncio.wrap_future(self._pending[-1])
+        self.close()
+        return {name: hasher.hexdigest() for name, hasher in self.hashers.items()}
+
+    def close(self):
+        """Stop the hashing thread (a discarded download's queued chunks are dropped)"""
+        self._pending.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+async def download_to_spool(message, spool, chat, progress_callback):
+    """
+    Download through the least-loaded pooled session, moving to another
+    session if one is flood-waited; returns the HashingWriter with the digests.
+    Backfills download through their takeout session instead.
+    """
+    if _takeout is not None:
+        writer = HashingWriter(spool)
+        try:
+            await _takeout.download_media(message, file=writer, progress_callback=progress_callback)
+        except BaseException:
+            writer.close()
+            raise
+        return writer
+    
+    from telethon import errors
+    while True:
+        async with session_pool.acquire() as session:
+            writer = HashingWriter(spool)
+            try:
+                source = message
+                if session.client is not get_client():
+                    # File references belong to the fetching account: re-read the message here
+                    peer = await resolve_chat(chat, session.client, session.name)
+                    source = await session.client.get_messages(peer, ids=message.id)
+                    if source is None or not source.media:
+                        raise ValueError(f"Message {message.id} is not visible to session '{session.name}'")
+                await session.client.download_media(source, file=writer, progress_callback=progress_callback)
+            except errors.FloodWaitError as e:
+                writer.close()
+                session_pool.report_flood(session, e.seconds)
+                download_limiter.record(throttled=True)
+                spool.rewind()
+                continue
+            except BaseException:
+                writer.close()
+                raise
+            session_pool.record(session, spool.length)
+            return writer
+
+async def process_single_video(message, filename, drive_uploader, file_size, chat=TARGET_CHAT, keep_going=None,
+                               download_slot=None):
+    """
+    Process one video with memory-safe approach.
+    keep_going: optional ownership check passed to the upload thread (see DriveUploader.upload_file)
+    download_slot: AsyncExitStack already holding a download_limiter slot; taken here when omitted.
+    It is released as soon as the download ends, so the upload doesn't hold up the next download.
+    """
     print(f"🔄 Processing: {filename} ({file_size / 1024 / 1024:.1f} MB)")
     
-    # Use system's default temp directory (cross-platform compatible)
-    with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as tmp_file:
-        tmp_path = tmp_file.name
+    if download_slot is None:
+        download_slot = AsyncExitStack()
+        await download_slot.enter_async_context(download_limiter.slot())
+    spool = None
     
     try:
+        # Preallocated, memory-mapped spool sized to the document, taken only once
+        # this file may download (waits here while the spool quota or disk is full)
+        try:
+            with tracer.span('spool_acquire', bytes=file_size):
+                spool = await spool_manager.acquire(file_size)
+        except OSError as e:
+            print(f"❌ No spool space for {filename}: {e}")
+            return False
+        tmp_path = spool.path
+        
         # Download with progress tracking
         start_time = time.time()
         
-        def progress_callback_dl(current, total):
+        log_progress = RateLimitedLog(transfer_logger)
+        received = 0
+        
+        async def progress_callback_dl(current, total):
+            # Telethon awaits this after every part, so the shaper paces the download here
+            nonlocal received
+            await download_shaper.throttle_async(max(0, current - received))
+            received = current
+            
             elapsed = max(1e-6, time.time() - start_time)
             percent = (current / total) * 100 if total else 0
             speed = (current / elapsed) / 1024 / 1024  # MB/s
             update_global_progress('downloading', filename, percent, total, current, speed)
             
-            # Print progress occasionally to avoid spam
-            if int(percent) % 5 == 0:  # Every 5%
-                print(f"\rDownload: {percent:.1f}% ({speed:.1f} MB/s)", end='', flush=True)
+            # Queued, rate-limited progress record (never blocks the download)
+            log_progress("⬇️ Download progress", force=current >= total,
+                         extra={'file': filename, 'percent': round(percent, 1), 'mb_s': round(speed, 2)})
         
         print("⬇️ Downloading from Telegram...")
-        await client.download_media(
-            message,
-            file=tmp_path,
-            progress_callback=progress_callback_dl
-        )
+        with tracer.span('download') as span:
+            try:
+                writer = await download_to_spool(message, spool, chat, progress_callback_dl)
+            except Exception:
+                download_limiter.record(failed=True)
+                raise
+            spool.finalize()
+            span.set(bytes=spool.length)
+        await download_slot.aclose()
+        download_limiter.record(spool.length)
         print(f"\n✅ Downloaded: {filename}")
         
-        # Force garbage collection after download
-        gc.collect()
+        # Probe in the process pool so CPU work never stalls transfers;
+        # hashes were computed on the writer's thread while downloading
+        with tracer.span('probe'):
+            details = await cpu_pool.run(probe_video_metadata, tmp_path)
+        details['hashes'] = await writer.hexdigests()
+        details['channel'] = chat
+        if message.date:
+            details['date'] = message.date.timestamp()
+        duplicate_of = drive_uploader.find_by_hash(details['hashes']['md5'])
+        if duplicate_of:
+            print(f"⏭️ Same content already uploaded as {duplicate_of}, skipping upload")
+            if keep_going and not await asyncio.to_thread(keep_going, confirm=True):
+                return False
+            await asyncio.to_thread(drive_uploader.record_duplicate, filename, duplicate_of, details)
+            return True
         
         # Upload using memory-safe method
         print("⬆️ Uploading to Google Drive...")
         update_global_progress('uploading', filename, 0, file_size)
-        drive_uploader.upload_file(tmp_path, filename)
+        # Blocking HTTP upload runs in a worker thread so the event loop (API
+        # handlers, lease heartbeats, Telegram updates) keeps running
+        async with upload_limiter.slot():
+            try:
+                await asyncio.to_thread(drive_uploader.upload_file, tmp_path, filename, details=details, spool=spool,
+                                        keep_going=keep_going)
+            except Exception:
+                upload_limiter.record(failed=True)
+                raise
+        upload_limiter.record(spool.length)
         
         print(f"✅ Successfully processed: {filename}")
         return True
@@ -118,80 +431,374 @@ async def process_single_video(message, filename, drive_uploader, file_size):
         return False
         
     finally:
+        # No-op if the download finished and already gave its slot back
+        await download_slot.aclose()
+        
         # Always clean up temp file
         try:
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+            if spool is not None:
+                spool_manager.dispose(spool)
         except:
             pass
         
-        # Force garbage collection after each file
-        gc.collect()
+        # Measure after each file; the governor collects only if over budget
+        memory_governor.sample()
+
+async def keep_lease_alive(coordinator, key, transfer_task, lease_lost):
+    """Heartbeat a lease while its transfer runs; abort the transfer if the lease is lost"""
+    while not transfer_task.done():
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        if transfer_task.done():
+            break
+        if not await asyncio.to_thread(coordinator.heartbeat, key):
+            print(f"\n⚠️ Lease lost for {key}, another worker took over")
+            # Cancelling the task can't stop an upload thread; the event makes it stop at the next chunk
+            lease_lost.set()
+            transfer_task.cancel()
+            break
 
-async def main():
-    """Main processing function with memory management"""
+async def process_leased_video(coordinator, key, message, filename, drive_uploader, file_size, chat=TARGET_CHAT,
+                               download_slot=None):
+    """Process one video under a lease so no other worker uploads it concurrently"""
+    lease_lost = threading.Event()
+    
+    def keep_going(confirm=False):
+        # Runs in the upload thread: the event between chunks, the lease store itself before recording
+        if lease_lost.is_set():
+            return False
+        if confirm and not coordinator.heartbeat(key):
+            print(f"\n⚠️ Lease lost for {key} before recording, discarding this copy")
+            lease_lost.set()
+            return False
+        return True
+    
+    transfer_task = asyncio.create_task(
+        process_single_video(message, filename, drive_uploader, file_size, chat, keep_going=keep_going,
+                             download_slot=download_slot))
+    heartbeat_task = asyncio.create_task(keep_lease_alive(coordinator, key, transfer_task, lease_lost))
+    try:
+        success = await transfer_task
+    except asyncio.CancelledError:
+        success = False
+    finally:
+        heartbeat_task.cancel()
+    
+    # Lease store calls are blocking SQLite transactions, kept off the event loop
+    if success:
+        await asyncio.to_thread(coordinator.complete, key)
+    else:
+        await asyncio.to_thread(coordinator.release, key)
+    return success
+
+async def transfer_video(message, chat, drive_uploader, coordinator, label=''):
+    """Skip checks, lease and transfer for one video message; returns True if uploaded"""
+    with tracer.span('title_parse', message_id=message.id):
+        title = get_video_title(message)
+        filename = f"{title}.mp4"
+        file_size = get_file_size(message)
+    
+    print(f"\n📹 {label}{filename}")
+    
+    with tracer.span('file', file=filename, message_id=message.id) as span:
+        # Skip if already uploaded
+        if drive_uploader.is_uploaded(filename):
+            print("⏭️ Already uploaded, skipping")
+            span.set(outcome='already_uploaded')
+            return False
+        
+        # Skip very large files on limited memory instances
+        if file_size > 800 * 1024 * 1024:  # 800MB limit for safety
+            print(f"⚠️ Skipping large file ({file_size / 1024 / 1024:.1f} MB) to prevent memory issues")
+            span.set(outcome='too_large')
+            return False
+        
+        # Hold new transfers while the process is over its memory budget
+        await memory_governor.wait_for_budget()
+        
+        # Wait for a download slot before claiming: a queued file holds neither
+        # a heartbeated lease nor a preallocated spool
+        async with AsyncExitStack() as download_slot:
+            await download_slot.enter_async_context(download_limiter.slot())
+            
+            # Claim the file so other workers skip it while we transfer
+            key = lease_key(chat, message)
+            if not await asyncio.to_thread(coordinator.claim, key):
+                print("⏭️ Claimed or completed by another worker, skipping")
+                span.set(outcome='leased_elsewhere')
+                return False
+            
+            # Process the video (the slot is handed back once its download ends)
+            success = await process_leased_video(coordinator, key, message, filename, drive_uploader, file_size, chat,
+                                                 download_slot=download_slot)
+        span.set(outcome='uploaded' if success else 'failed', bytes=file_size if success else 0)
+        return success
+
+def _start_blocking_services():
+    """Drive auth and folder lookup, spool cleanup, lease store and crypto benchmark (blocking I/O and CPU)"""
+    drive_uploader = drive_sessions.uploader()
+    drive_uploader.progress_callback = update_global_progress
+    drive_uploader.authenticate()
+    drive_uploader.create_folder()
+    spool_manager.reclaim_orphans()
+    coordinator = open_coordinator()
+    print(f"🔒 Worker id: {coordinator.worker_id} ({type(coordinator).__name__})")
+    
+    # Benchmark Telethon's AES-IGE backends once and switch to the fastest
+    get_crypto_status()
+    return drive_uploader, coordinator
+
+async def start_services():
+    """Initialize Drive, spool, leases and the Telegram client shared by all modes"""
+    # Off the loop: under the ASGI server this loop also serves the API
+    drive_uploader, coordinator = await asyncio.to_thread(_start_blocking_services)
+    try:
+        memory_governor.start()
+        download_limiter.reset()
+        upload_limiter.reset()
+        await get_client().start(PHONE_NUMBER)
+        await session_pool.start(get_client(), API_ID, API_HASH)
+    except BaseException:
+        coordinator.close()
+        raise
+    print("✅ Services initialized")
+    return drive_uploader, coordinator
+
+def export_trace():
+    """Write this run's Chrome trace and print the per-stage summary"""
+    try:
+        trace_path = tracer.export()
+        if trace_path:
+            print(f"\n🧭 Stage summary (trace: {trace_path})")
+            print(tracer.summary_table())
+    except Exception as e:
+        print(f"⚠️ Could not export trace: {e}")
+
+async def main(backfill=False):
+    """Main processing function with memory management; backfill=True exports through a takeout session"""
     print("🚀 Starting Memory-Safe Telegram → Google Drive Transfer")
+    tracer.start_run(f"backfill-{time.strftime('%Y%m%d-%H%M%S')}" if backfill else None)
+    coordinator = None
     
     try:
-        # Initialize services
-        drive_uploader = DriveUploader(progress_callback=update_global_progress)
-        drive_uploader.authenticate()
-        drive_uploader.create_folder()
-        
-        await client.start(PHONE_NUMBER)
-        print("✅ Services initialized")
-        
-        # Get video messages
-        print("📥 Scanning for video messages...")
-        video_messages = []
-        
-        async for message in client.iter_messages(TARGET_CHAT):
-            if (message.media and
-                isinstance(message.media, MessageMediaDocument) and
-                message.media.document and
-                message.media.document.attributes):
-                for attr in message.media.document.attributes:
-                    if isinstance(attr, DocumentAttributeVideo):
-                        video_messages.append(message)
-                        break
-        
-        print(f"✅ Found {len(video_messages)} videos")
-        if not video_messages:
-            return
-        
-        # Process videos one by one (never parallel to avoid memory issues)
-        success_count = 0
-        for i, message in enumerate(video_messages, 1):
-            title = get_video_title(message)
-            filename = f"{title}.mp4"
-            file_size = get_file_size(message)
+        drive_uploader, coordinator = await start_services()
+        if not drive_uploader.uploaded:
+            print("💡 Tracker is empty; if the Drive folder already has videos, run `python run.py --reconcile` first")
+        
+        async with transfer_session(backfill):
+            # Get video messages
+            print("📥 Scanning for video messages...")
+            with tracer.span('scan', chat=TARGET_CHAT, backfill=backfill) as span:
+                video_messages = await scan_video_messages(
+                    TARGET_CHAT, skip=lambda record: drive_uploader.is_uploaded(f"{record['title']}.mp4"))
+                span.set(videos=len(video_messages))
             
-            print(f"\n📹 [{i}/{len(video_messages)}] {filename}")
+            print(f"✅ Found {len(video_messages)} videos")
+            if not video_messages:
+                return
             
-            # Skip if already uploaded
-            if drive_uploader.is_uploaded(filename):
-                print("⏭️ Already uploaded, skipping")
-                continue
+            # Workers pull files in order; the adaptive limiters decide how many
+            # downloads and uploads actually run at once, and the spool quota
+            # and memory governor bound what is held in between
+            pending = iter(enumerate(video_messages, 1))
+            success_count = 0
             
-            # Skip very large files on limited memory instances
-            if file_size > 800 * 1024 * 1024:  # 800MB limit for safety
-                print(f"⚠️ Skipping large file ({file_size / 1024 / 1024:.1f} MB) to prevent memory issues")
-                continue
+            async def worker():
+                nonlocal success_count
+                for i, message in pending:
+                    if await transfer_video(message, TARGET_CHAT, drive_uploader, coordinator, f"[{i}/{len(video_messages)}] "):
+                        success_count += 1
             
-            # Process the video
-            success = await process_single_video(message, filename, drive_uploader, file_size)
-            if success:
-                success_count += 1
+            await asyncio.gather(*(worker() for _ in range(min(CONCURRENCY_MAX, len(video_messages)))))
         
         print(f"\n🎉 Processing complete! {success_count} videos uploaded.")
+        print(f"🔒 Lease summary: {coordinator.get_stats()}")
+        print(f"👥 Session summary: {session_pool.get_stats()}")
+        print(f"🎛️ Concurrency: download {download_limiter.get_stats()}, upload {upload_limiter.get_stats()}")
         
     except Exception as e:
         print(f"❌ Main error: {e}")
         raise
     finally:
+        await session_pool.disconnect()
+        await get_client().disconnect()
+        if coordinator is not None:
+            coordinator.close()
+        cpu_pool.shutdown()
+        memory_governor.stop()
+        export_trace()
+
+async def reconcile(chat=TARGET_CHAT):
+    """
+    Rebuild the tracker from files already in the Drive folder (fresh host or
+    lost uploaded_videos.json) with one folder listing, instead of re-uploading.
+    """
+    print("🔁 Reconciling the tracker with the Drive folder")
+    drive_uploader = drive_sessions.uploader()
+    drive_uploader.authenticate()
+    drive_uploader.create_folder()
+    await get_client().start(PHONE_NUMBER)
+    try:
+        # Cached records are enough to match against; only newer messages are searched
+        await scan_video_messages(chat, skip=lambda record: True)
+        records = metadata_cache.get_messages(chat)
+        print(f"📋 Matching {len(records)} channel videos against the Drive folder...")
+        stats = drive_uploader.reconcile(records, channel=chat)
+    finally:
+        await get_client().disconnect()
+    
+    print(f"✅ Reconciled: {stats['imported']} entries imported "
+          f"({stats['matched_by_name']} by name, {stats['matched_by_size']} by size, {stats['drive_only']} Drive-only)")
+    print(f"   {stats['already_tracked']} already tracked, {stats['not_in_drive']} channel videos not in Drive, "
+          f"{stats['drive_duplicates']} duplicate copies in Drive")
+    return stats
+
+# Live monitoring state, read by app.py
+monitor_state = {
+    'running': False,
+    'chats': [],
+    'started_at': None,
+    'videos_received': 0,
+    'videos_uploaded': 0,
+    'queue_size': 0,
+    'last_video': None,
+    'last_error': None
+}
+_monitor_loop = None
+_monitor_stop = None
+
+async def monitor(chats=None):
+    """
+    Event-driven live mode: new video posts in the watched chats are pushed
+    straight into the transfer queue as Telegram delivers them, with no
+    periodic rescans. Runs until stop_monitor() is called.
+    """
+    global _monitor_loop, _monitor_stop
+    from telethon import events
+    client = get_client()
+    chats = chats or MONITOR_CHATS
+    queue = asyncio.Queue()
+    _monitor_loop = asyncio.get_running_loop()
+    _monitor_stop = asyncio.Event()
+    
+    tracer.start_run(f"monitor-{time.strftime('%Y%m%d-%H%M%S')}")
+    monitor_state.update({
+        'running': True,
+        'chats': list(chats),
+        'started_at': time.time(),
+        'videos_received': 0,
+        'videos_uploaded': 0,
+        'queue_size': 0,
+        'last_video': None,
+        'last_error': None
+    })
+    
+    handlers = []
+    coordinator = None
+    try:
+        drive_uploader, coordinator = await start_services()
+        
+        # Map peer ids back to the configured chat names used in lease keys
+        chat_names = {}
+        for chat in chats:
+            chat_names[await client.get_peer_id(await resolve_chat(chat, client))] = chat
+        
+        async def on_new_message(event):
+            if is_video_message(event.message):
+                chat = chat_names.get(event.chat_id, str(event.chat_id))
+                metadata_cache.record_messages(chat, [message_record(event.message)])
+                monitor_state['videos_received'] += 1
+                queue.put_nowait((chat, event.message))
+                monitor_state['queue_size'] = queue.qsize()
+                print(f"\n🔔 New video in {event.chat_id} (message {event.message.id}), queued")
+        
+        async def on_edited(event):
+            # Keep cached titles/sizes in step with edits, and drop posts that stop being videos
+            chat = chat_names.get(event.chat_id, str(event.chat_id))
+            if is_video_message(event.message):
+                metadata_cache.record_messages(chat, [message_record(event.message)])
+            else:
+                metadata_cache.forget_messages(chat, [event.message.id])
+        
+        async def on_deleted(event):
+            if event.chat_id in chat_names:
+                metadata_cache.forget_messages(chat_names[event.chat_id], event.deleted_ids)
+        
+        handlers = [
+            (on_new_message, events.NewMessage(chats=list(chat_names))),
+            (on_edited, events.MessageEdited(chats=list(chat_names))),
+            (on_deleted, events.MessageDeleted(chats=list(chat_names)))
+        ]
+        for callback, event in handlers:
+            client.add_event_handler(callback, event)
+        print(f"👀 Monitoring {', '.join(map(str, chats))} for new videos...")
+        
+        workers = asyncio.Semaphore(CONCURRENCY_MAX)
+        in_flight = set()
+        
+        async def transfer_live(message, chat):
+            try:
+                if await transfer_video(message, chat, drive_uploader, coordinator, '[live] '):
+                    monitor_state['videos_uploaded'] += 1
+            except Exception as e:
+                monitor_state['last_error'] = str(e)
+                print(f"❌ Monitor transfer error: {e}")
+            finally:
+                workers.release()
+        
+        while not _monitor_stop.is_set():
+            get_task = asyncio.ensure_future(queue.get())
+            stop_task = asyncio.ensure_future(_monitor_stop.wait())
+            done, _ = await asyncio.wait({get_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+            stop_task.cancel()
+            if get_task not in done:
+                get_task.cancel()
+                break
+            
+            chat, message = get_task.result()
+            if tracer.rotate_due():
+                # Days-long monitor runs write a trace segment per period instead of one growing buffer
+                export_trace()
+                tracer.start_run(f"monitor-{time.strftime('%Y%m%d-%H%M%S')}")
+            monitor_state['queue_size'] = queue.qsize()
+            monitor_state['last_video'] = get_video_title(message)
+            # Up to CONCURRENCY_MAX files in flight; the limiters set the real parallelism
+            await workers.acquire()
+            task = asyncio.create_task(transfer_live(message, chat))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        
+        if in_flight:
+            print(f"⏳ Finishing {len(in_flight)} in-flight transfer(s)...")
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        print("🛑 Monitoring stopped")
+        
+    except Exception as e:
+        monitor_state['last_error'] = str(e)
+        print(f"❌ Monitor error: {e}")
+        raise
+    finally:
+        for callback, event in handlers:
+            client.remove_event_handler(callback, event)
+        monitor_state['running'] = False
+        _monitor_loop = None
+        _monitor_stop = None
+        await session_pool.disconnect()
         await client.disconnect()
-        # Final cleanup
-        gc.collect()
+        if coordinator is not None:
+            coordinator.close()
+        cpu_pool.shutdown()
+        memory_governor.stop()
+        export_trace()
+
+def stop_monitor():
+    """Ask a running monitor to stop (safe to call from any thread)"""
+    if _monitor_loop and _monitor_stop:
+        _monitor_loop.call_soon_threadsafe(_monitor_stop.set)
+        return True
+    return False
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    from logging_config import setup_logging
+    setup_logging()
+    import sys
+    asyncio.run(main(backfill='--backfill' in sys.argv))
\ No newline at end of file
@@ -0,0 +1,112 @@
+# test_bandwidth.py
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+import bandwidth
+from bandwidth import BandwidthShaper, validate_limit, validate_schedule
+
+MB = 1024 * 1024
+
+
+class FakeClock:
+    """Stands in for time.monotonic/time.sleep so throttling is measured, not waited for"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+
+class ValidationTest(unittest.TestCase):
+    def test_limits(self):
+        self.assertIsNone(validate_limit(None))
+        self.assertEqual(validate_limit('5'), 5.0)
+        for bad in (0, -1, 'abc', float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                validate_limit(bad)
+
+    def test_schedule(self):
+        windows = validate_schedule([{'start': '22:00', 'end': '06:00', 'mb_s': '20'}])
+        self.assertEqual(windows, [{'start': '22:00', 'end': '06:00', 'mb_s': 20.0}])
+        with self.assertRaises(ValueError):
+            validate_schedule([{'start': '25:00', 'end': '06:00', 'mb_s': 1}])
+        with self.assertRaises(ValueError):
+            validate_schedule([{'start': '09:00', 'end': '10:00', 'mb_s': 0}])
+
+    def test_invalid_default_leaves_settings_unchanged(self):
+        shaper = BandwidthShaper('upload', default=8)
+        for bad in (0, 'abc'):
+            with self.assertRaises(ValueError):
+                shaper.set_schedule([{'start': '09:00', 'end': '18:00', 'mb_s': 2}], default=bad)
+        self.assertEqual(shaper.default, 8.0)
+        self.assertEqual(shaper.schedule, [])
+        shaper.set_schedule([], default='5')
+        self.assertEqual(shaper.default, 5.0)
+
+    def test_invalid_override(self):
+        shaper = BandwidthShaper('download')
+        with self.assertRaises(ValueError):
+            shaper.set_override(0)
+        self.assertIsNone(shaper.override)
+
+
+class ScheduleTest(unittest.TestCase):
+    def test_windows_and_midnight_wrap(self):
+        shaper = BandwidthShaper('upload', default=50, schedule=[
+            {'start': '09:00', 'end': '18:00', 'mb_s': 20},
+            {'start': '22:00', 'end': '06:00', 'mb_s': None},
+        ])
+        self.assertEqual(shaper.current_limit(datetime(2026, 1, 1, 12, 0)), 20.0)
+        self.assertEqual(shaper.current_limit(datetime(2026, 1, 1, 18, 0)), 50.0)
+        self.assertIsNone(shaper.current_limit(datetime(2026, 1, 1, 23, 30)))
+        self.assertIsNone(shaper.current_limit(datetime(2026, 1, 1, 5, 59)))
+
+    def test_override_wins_until_cleared(self):
+        shaper = BandwidthShaper('upload', default=50)
+        shaper.set_override(None)
+        self.assertIsNone(shaper.current_limit())
+        shaper.clear_override()
+        self.assertEqual(shaper.current_limit(), 50.0)
+
+
+class ThrottleTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        fake_time = SimpleNamespace(monotonic=self.clock.monotonic, sleep=self.clock.sleep)
+        patcher = mock.patch.object(bandwidth, 'time', fake_time)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unlimited_never_waits(self):
+        shaper = BandwidthShaper('upload')
+        shaper.throttle(100 * MB)
+        self.assertEqual(self.clock.slept, 0)
+
+    def test_paces_to_the_limit(self):
+        # 8 MB/s keeps every pause exact in binary floating point
+        shaper = BandwidthShaper('upload', default=8)
+        for _ in range(16):
+            shaper.throttle(MB)
+        self.assertAlmostEqual(self.clock.slept, 2.0, delta=0.01)
+        self.assertAlmostEqual(shaper.shaped_seconds, self.clock.slept)
+
+    def test_idle_time_refills_only_up_to_the_burst(self):
+        shaper = BandwidthShaper('upload', default=8)
+        shaper.throttle(0)
+        self.clock.now += 60
+        shaper.throttle(int(8 * MB * bandwidth.BANDWIDTH_BURST_SECONDS))
+        self.assertEqual(self.clock.slept, 0)
+        shaper.throttle(MB)
+        self.assertAlmostEqual(self.clock.slept, 0.125, delta=0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
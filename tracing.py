@@ -0,0 +1,158 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+TRACE_ENABLED = True
+TRACE_DIR = 'traces'
+TRACE_MAX_EVENTS = 20000  # Spans kept for the Chrome trace; the oldest are dropped (the summary still counts them)
+TRACE_ROTATE_SECONDS = 3600  # Long-running monitor runs export and start a new trace segment this often
+
+# File being processed by the current task/thread; asyncio.to_thread copies it along
+_current_file = contextvars.ContextVar('trace_file', default=None)
+
+
+class Span:
+    """An open span; stage code attaches bytes, retries or other details with set()"""
+    __slots__ = ('name', 'file', 'start', 'attrs')
+
+    def __init__(self, name, file, start, attrs):
+        self.name = name
+        self.file = file
+        self.start = start
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Records per-file stage spans (start/end, bytes, retries) for one run and
+    exports them as Chrome trace events (chrome://tracing, Perfetto) or as a
+    per-stage summary table. Only the latest TRACE_MAX_EVENTS spans are kept,
+    while the per-stage totals are accumulated as spans close, so memory stays
+    flat however long the run is.
+    """
+
+    def __init__(self):
+        self.run_id = None
+        self.events = deque(maxlen=TRACE_MAX_EVENTS)
+        self.dropped = 0
+        self._stages = {}
+        self._origin = time.perf_counter()
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def start_run(self, run_id=None):
+        with self._lock:
+            self.run_id = run_id or time.strftime('%Y%m%d-%H%M%S')
+            self.events = deque(maxlen=TRACE_MAX_EVENTS)
+            self.dropped = 0
+            self._stages = {}
+            self._origin = time.perf_counter()
+            self._started = time.monotonic()
+
+    def rotate_due(self):
+        """True once the current run has been recording for TRACE_ROTATE_SECONDS"""
+        return time.monotonic() - self._started >= TRACE_ROTATE_SECONDS
+
+    @contextmanager
+    def span(self, name, file=None, **attrs):
+        """Time a stage; pass file= on the outermost per-file span so nested stages inherit it"""
+        if not TRACE_ENABLED:
+            yield _NULL_SPAN
+            return
+        token = _current_file.set(file) if file is not None else None
+        span = Span(name, file or _current_file.get(), time.perf_counter(), attrs)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs['error'] = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                if len(self.events) == self.events.maxlen:
+                    self.dropped += 1
+                self.events.append((span.name, span.file, span.start, end, threading.get_ident(), span.attrs))
+                self._account(span.name, end - span.start, span.attrs)
+            if token is not None:
+                _current_file.reset(token)
+
+    def chrome_trace(self):
+        """Chrome trace event format ('X' complete events, microsecond timestamps)"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        trace_events = []
+        for name, file, start, end, tid, attrs in events:
+            args = dict(attrs)
+            if file:
+                args['file'] = file
+            trace_events.append({
+                'name': name,
+                'cat': 'transfer',
+                'ph': 'X',
+                'ts': round((start - self._origin) * 1e6, 1),
+                'dur': round((end - start) * 1e6, 1),
+                'pid': pid,
+                'tid': tid,
+                'args': args
+            })
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms',
+                'otherData': {'run_id': self.run_id, 'dropped_spans': self.dropped}}
+
+    def _account(self, name, duration, attrs):
+        stage = self._stages.setdefault(name, {'count': 0, 'total_s': 0.0, 'max_s': 0.0,
+                                               'bytes': 0, 'retries': 0, 'errors': 0})
+        stage['count'] += 1
+        stage['total_s'] += duration
+        stage['max_s'] = max(stage['max_s'], duration)
+        stage['bytes'] += attrs.get('bytes', 0) or 0
+        stage['retries'] += attrs.get('retries', 0) or 0
+        stage['errors'] += 1 if 'error' in attrs else 0
+
+    def summary(self):
+        """Per-stage totals over the whole run: count, total/mean/max seconds, bytes, retries, errors"""
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self._stages.items()}
+        for stage in stages.values():
+            stage['mean_s'] = stage['total_s'] / stage['count']
+        return stages
+
+    def summary_table(self):
+        stages = self.summary()
+        lines = [f"{'stage':<18}{'count':>7}{'total s':>10}{'mean s':>9}{'max s':>9}{'MB':>10}{'MB/s':>8}{'retries':>9}{'errors':>8}"]
+        for name, stage in sorted(stages.items(), key=lambda item: -item[1]['total_s']):
+            mb = stage['bytes'] / 1024 / 1024
+            rate = mb / stage['total_s'] if stage['bytes'] and stage['total_s'] else 0
+            lines.append(f"{name:<18}{stage['count']:>7}{stage['total_s']:>10.2f}{stage['mean_s']:>9.3f}"
+                         f"{stage['max_s']:>9.3f}{mb:>10.1f}{rate:>8.1f}{stage['retries']:>9}{stage['errors']:>8}")
+        return '\n'.join(lines)
+
+    def export(self, directory=TRACE_DIR):
+        """Write the Chrome trace and summary for this run; returns the trace path"""
+        if not self.events:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        trace_path = os.path.join(directory, f"run-{self.run_id}.json")
+        with open(trace_path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        with open(os.path.join(directory, f"run-{self.run_id}-summary.json"), 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+        return trace_path
+
+
+tracer = Tracer()